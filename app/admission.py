@@ -0,0 +1,183 @@
+"""
+Contrôle d'admission du chemin d'inférence
+Limite le nombre d'inférences simultanées, borne la file d'attente et
+répartit équitablement les places entre médecins. Au-delà, les requêtes
+sont refusées immédiatement (429 / 503 avec Retry-After).
+"""
+
+import asyncio
+import os
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Hashable
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+from app.metrics import registry
+from app.server import worker_count
+
+load_dotenv()
+
+# Configuration de l'admission (par worker : par défaut, les cœurs CPU sont répartis entre les workers)
+INFERENCE_MAX_CONCURRENCY = int(os.getenv(
+    "INFERENCE_MAX_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // worker_count()))
+))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+# Inférences en cours + en attente autorisées par utilisateur
+INFERENCE_MAX_PER_USER = int(os.getenv("INFERENCE_MAX_PER_USER", "4"))
+INFERENCE_QUEUE_TIMEOUT = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "30"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "5"))
+
+
+class InferenceLimiter:
+    """Sémaphore équitable avec file d'attente bornée"""
+
+    def __init__(
+        self,
+        max_concurrency: int = INFERENCE_MAX_CONCURRENCY,
+        max_queue: int = INFERENCE_MAX_QUEUE,
+        max_per_user: int = INFERENCE_MAX_PER_USER,
+        queue_timeout: float = INFERENCE_QUEUE_TIMEOUT,
+        retry_after: int = INFERENCE_RETRY_AFTER
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._active = 0
+        self._queued = 0
+        # File par utilisateur, servie à tour de rôle
+        self._waiters: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._per_user: Counter = Counter()
+        self.admitted = 0
+        self.rejected_user = 0
+        self.rejected_queue = 0
+        self.timeouts = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _reject(self, status_code: int, detail: str):
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+    @asynccontextmanager
+    async def slot(self, user_id: Hashable):
+        """Réserve une place d'inférence pour la durée du bloc"""
+        if self._per_user[user_id] >= self.max_per_user:
+            self.rejected_user += 1
+            self._reject(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Trop d'analyses en cours pour cet utilisateur"
+            )
+
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+        else:
+            if self._queued >= self.max_queue:
+                self.rejected_queue += 1
+                self._reject(
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "Service d'analyse saturé, réessayez plus tard"
+                )
+            await self._wait(user_id)
+
+        self._per_user[user_id] += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+            self._release()
+
+    async def _wait(self, user_id: Hashable):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(future)
+        self._queued += 1
+        # La place en file compte dans la part de l'utilisateur
+        self._per_user[user_id] += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Délai d'attente du service d'analyse dépassé"
+            )
+        except BaseException:
+            # Place transmise juste avant l'annulation : la rendre
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+            if not future.done() or future.cancelled():
+                self._discard(user_id, future)
+
+    def _discard(self, user_id: Hashable, future: asyncio.Future):
+        waiters = self._waiters.get(user_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self._queued -= 1
+            if not waiters:
+                del self._waiters[user_id]
+
+    def _release(self):
+        # Transmettre la place au prochain utilisateur en attente (tourniquet)
+        while self._waiters:
+            user_id, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                self._waiters.move_to_end(user_id)
+            else:
+                del self._waiters[user_id]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> dict:
+        """État courant pour la supervision"""
+        return {
+            "actives": self._active,
+            "en_attente": self._queued,
+            "max_simultanees": self.max_concurrency,
+            "max_file": self.max_queue,
+            "max_par_utilisateur": self.max_per_user,
+            "admises": self.admitted,
+            "refusees_utilisateur": self.rejected_user,
+            "refusees_file": self.rejected_queue,
+            "delais_depasses": self.timeouts,
+        }
+
+
+# Limiteur partagé par le processus
+inference_limiter = InferenceLimiter()
+
+registry.gauge("inference_active", "Inférences en cours", lambda: inference_limiter.active)
+registry.gauge("inference_queue_depth", "Inférences en attente d'une place", lambda: inference_limiter.queued)
+registry.counter_func(
+    "inference_rejected",
+    "Inférences refusées par le contrôle d'admission",
+    lambda: {
+        ("utilisateur",): inference_limiter.rejected_user,
+        ("file",): inference_limiter.rejected_queue,
+        ("delai",): inference_limiter.timeouts,
+    },
+    ("motif",)
+)
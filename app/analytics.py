@@ -0,0 +1,252 @@
+"""
+Moteur d'analyse en mémoire des diagnostics
+Conserve un instantané colonnaire (NumPy) de la table diagnostics,
+rafraîchi de façon incrémentale, pour répondre aux requêtes de
+distribution sans re-scanner la table à chaque appel. Un contrôle
+périodique (nombre et somme des ids déjà chargés) détecte les suppressions
+faites par les autres workers et les insertions validées hors de l'ordre
+des ids ; l'instantané est alors reconstruit.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import Diagnostic
+
+load_dotenv()
+
+# Nombre de stades de fibrose (F0 à F4)
+NB_STADES = 5
+
+# Taille des lots lus lors d'un rafraîchissement
+REFRESH_BATCH_SIZE = 50_000
+
+# Intervalle entre deux contrôles de cohérence avec la table (secondes, 0 = à chaque rafraîchissement)
+ANALYTICS_RECONCILE_INTERVAL = float(os.getenv("ANALYTICS_RECONCILE_INTERVAL", "30"))
+
+
+class AnalyticsSnapshot:
+    """Instantané colonnaire des diagnostics (modèle, résultat, probabilité, médecin, date)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Colonnes allouées au premier rafraîchissement (numpy importé à la demande)
+        self._ids = None
+        self._modeles = None
+        self._resultats = None
+        self._probabilites = None
+        self._medecins = None
+        self._dates = None
+        # Dictionnaire des noms de modèles -> code entier
+        self._modele_codes: dict[str, int] = {}
+        self._modele_noms: List[str] = []
+        self._last_id = 0
+        self._reconciled_at = 0.0
+        self.rebuilds = 0
+
+    def __len__(self) -> int:
+        return 0 if self._ids is None else len(self._ids)
+
+    def _allocate(self):
+        import numpy as np
+
+        self._ids = np.empty(0, dtype=np.int64)
+        self._modeles = np.empty(0, dtype=np.int32)
+        self._resultats = np.empty(0, dtype=np.int8)
+        self._probabilites = np.empty(0, dtype=np.float32)
+        self._medecins = np.empty(0, dtype=np.int32)
+        self._dates = np.empty(0, dtype="datetime64[s]")
+
+    def _encode_modele(self, nom: str) -> int:
+        code = self._modele_codes.get(nom)
+        if code is None:
+            code = len(self._modele_noms)
+            self._modele_codes[nom] = code
+            self._modele_noms.append(nom)
+        return code
+
+    def refresh(self, db: Session) -> int:
+        """Charge les diagnostics créés depuis le dernier rafraîchissement"""
+        with self._lock:
+            if self._ids is None:
+                self._allocate()
+            elif time.monotonic() - self._reconciled_at >= ANALYTICS_RECONCILE_INTERVAL:
+                self._reconcile(db)
+            added = 0
+            while True:
+                rows = db.query(
+                    Diagnostic.id,
+                    Diagnostic.modele_utilise,
+                    Diagnostic.resultat,
+                    Diagnostic.probabilite,
+                    Diagnostic.medecin_id,
+                    Diagnostic.date
+                ).filter(
+                    Diagnostic.id > self._last_id
+                ).order_by(Diagnostic.id).limit(REFRESH_BATCH_SIZE).all()
+
+                if not rows:
+                    break
+
+                self._append(rows)
+                added += len(rows)
+                if len(rows) < REFRESH_BATCH_SIZE:
+                    break
+            return added
+
+    def _reconcile(self, db: Session):
+        """Reconstruit l'instantané s'il diverge de la table pour les ids déjà chargés"""
+        count, total = db.query(
+            func.count(Diagnostic.id),
+            func.coalesce(func.sum(Diagnostic.id), 0)
+        ).filter(Diagnostic.id <= self._last_id).one()
+        self._reconciled_at = time.monotonic()
+        if int(count) != len(self._ids) or int(total) != int(self._ids.sum()):
+            self._allocate()
+            self._last_id = 0
+            self.rebuilds += 1
+
+    def _append(self, rows):
+        import numpy as np
+
+        ids, modeles, resultats, probabilites, medecins, dates = zip(*rows)
+        self._ids = np.concatenate([self._ids, np.asarray(ids, dtype=np.int64)])
+        self._modeles = np.concatenate([
+            self._modeles,
+            np.fromiter((self._encode_modele(m) for m in modeles), dtype=np.int32, count=len(rows))
+        ])
+        self._resultats = np.concatenate([self._resultats, np.asarray(resultats, dtype=np.int8)])
+        self._probabilites = np.concatenate([self._probabilites, np.asarray(probabilites, dtype=np.float32)])
+        self._medecins = np.concatenate([self._medecins, np.asarray(medecins, dtype=np.int32)])
+        self._dates = np.concatenate([
+            self._dates,
+            np.asarray([_to_datetime64(d) for d in dates], dtype="datetime64[s]")
+        ])
+        self._last_id = int(self._ids[-1])
+        if len(self._ids) == len(rows):
+            # Premier chargement : l'instantané est cohérent avec la table
+            self._reconciled_at = time.monotonic()
+
+    def discard(self, diagnostic_ids: Iterable[int]):
+        """Retire des diagnostics supprimés de l'instantané (suppressions faites par ce worker)"""
+        if self._ids is None:
+            # Instantané jamais chargé : rien à retirer
+            return
+        import numpy as np
+
+        ids = np.fromiter(diagnostic_ids, dtype=np.int64)
+        if not len(ids):
+            return
+        with self._lock:
+            keep = ~np.isin(self._ids, ids)
+            self._ids = self._ids[keep]
+            self._modeles = self._modeles[keep]
+            self._resultats = self._resultats[keep]
+            self._probabilites = self._probabilites[keep]
+            self._medecins = self._medecins[keep]
+            self._dates = self._dates[keep]
+
+    def _mask(
+        self,
+        medecin_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> "np.ndarray":
+        import numpy as np
+
+        mask = np.ones(len(self._ids), dtype=bool)
+        if medecin_id is not None:
+            mask &= self._medecins == medecin_id
+        if start is not None:
+            mask &= self._dates >= _to_datetime64(start)
+        if end is not None:
+            mask &= self._dates < _to_datetime64(end)
+        return mask
+
+    def probability_histogram(self, bins: int = 20, **filters) -> dict:
+        """Histogramme des probabilités par modèle"""
+        import numpy as np
+
+        with self._lock:
+            mask = self._mask(**filters)
+            edges = np.linspace(0.0, 1.0, bins + 1)
+            modeles = self._modeles[mask]
+            probabilites = self._probabilites[mask]
+            result = {}
+            for code in np.unique(modeles):
+                counts, _ = np.histogram(probabilites[modeles == code], bins=edges)
+                result[self._modele_noms[code]] = counts.tolist()
+            return {"bornes": edges.round(4).tolist(), "modeles": result}
+
+    def stage_matrix(self, **filters) -> dict:
+        """Répartition croisée modèle x stade de fibrose"""
+        import numpy as np
+
+        with self._lock:
+            mask = self._mask(**filters)
+            # Stades hors de F0-F4 ignorés : ils décaleraient la matrice
+            mask &= (self._resultats >= 0) & (self._resultats < NB_STADES)
+            modeles = self._modeles[mask]
+            resultats = self._resultats[mask].astype(np.int64)
+            nb_modeles = len(self._modele_noms)
+            flat = np.bincount(
+                modeles.astype(np.int64) * NB_STADES + resultats,
+                minlength=nb_modeles * NB_STADES
+            )[:nb_modeles * NB_STADES].reshape(nb_modeles, NB_STADES)
+            return {
+                self._modele_noms[code]: flat[code].tolist()
+                for code in np.unique(modeles)
+            }
+
+    def calibration(self, bins: int = 10, **filters) -> dict:
+        """Intervalles de calibration par modèle (effectif, probabilité moyenne, stade moyen)"""
+        import numpy as np
+
+        with self._lock:
+            mask = self._mask(**filters)
+            modeles = self._modeles[mask]
+            probabilites = self._probabilites[mask]
+            resultats = self._resultats[mask].astype(np.float64)
+            bin_index = np.clip((probabilites * bins).astype(np.int64), 0, bins - 1)
+            result = {}
+            for code in np.unique(modeles):
+                selection = modeles == code
+                idx = bin_index[selection]
+                effectifs = np.bincount(idx, minlength=bins)
+                somme_proba = np.bincount(idx, weights=probabilites[selection], minlength=bins)
+                somme_stade = np.bincount(idx, weights=resultats[selection], minlength=bins)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    moy_proba = np.where(effectifs > 0, somme_proba / effectifs, 0.0)
+                    moy_stade = np.where(effectifs > 0, somme_stade / effectifs, 0.0)
+                result[self._modele_noms[code]] = [
+                    {
+                        "borne_inf": i / bins,
+                        "borne_sup": (i + 1) / bins,
+                        "count": int(effectifs[i]),
+                        "moyenne_probabilite": round(float(moy_proba[i]), 4),
+                        "moyenne_stade": round(float(moy_stade[i]), 4)
+                    }
+                    for i in range(bins)
+                ]
+            return result
+
+
+def _to_datetime64(value) -> "np.datetime64":
+    import numpy as np
+
+    if value is None:
+        return np.datetime64("NaT", "s")
+    if getattr(value, "tzinfo", None) is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return np.datetime64(value, "s")
+
+
+# Instantané partagé par le processus
+snapshot = AnalyticsSnapshot()
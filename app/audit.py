@@ -0,0 +1,462 @@
+"""
+Journalisation d'audit non bloquante
+Les requêtes sur les patients et diagnostics sont placées dans une file
+en mémoire ; un thread d'arrière-plan les insère par lots dans audit_logs.
+Aucune entrée n'est abandonnée : file pleine ou base indisponible, elles
+sont reportées dans un fichier local repris dès que les écritures aboutissent.
+"""
+
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table, Text,
+    and_, delete, func, insert, inspect, select
+)
+
+from app.auth import decode_token_subject
+from app.database import SessionLocal, engine
+from app.metrics import _pid_alive, registry
+from app.models import AuditLog
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration de la file d'audit
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "50000"))
+# Intervalle minimal entre deux avertissements de file pleine (secondes)
+AUDIT_DROP_LOG_INTERVAL = float(os.getenv("AUDIT_DROP_LOG_INTERVAL", "60"))
+# Répertoire local des entrées qui ne tiennent pas dans la file (repris par le thread de vidage)
+AUDIT_SPILL_DIR = os.getenv("AUDIT_SPILL_DIR", "audit_spill")
+
+# Rétention : jours conservés dans audit_logs, mois conservés en archive
+AUDIT_HOT_DAYS = int(os.getenv("AUDIT_HOT_DAYS", "90"))
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "60"))
+# Nombre de lignes déplacées par transaction lors de l'archivage
+AUDIT_ARCHIVE_CHUNK = int(os.getenv("AUDIT_ARCHIVE_CHUNK", "50000"))
+
+# Tables auditées : préfixe d'URL -> nom de table
+AUDITED_PATHS = {
+    "/api/patients": "patients",
+    "/api/diagnostics": "diagnostics",
+}
+
+ACTIONS = {
+    "GET": "lecture",
+    "POST": "creation",
+    "PUT": "modification",
+    "PATCH": "modification",
+    "DELETE": "suppression",
+}
+
+# Fichier de débordement d'un processus (en cours d'écriture ou de reprise)
+SPILL_FILE = re.compile(r"audit-(\d+)\.(?:jsonl|draining)")
+
+_STOP = object()
+
+
+class AuditQueue:
+    """File d'audit en mémoire vidée par lots dans la base de données"""
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        max_size: int = AUDIT_QUEUE_SIZE,
+        drop_log_interval: float = AUDIT_DROP_LOG_INTERVAL,
+        spill_dir: str = AUDIT_SPILL_DIR
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_log_interval = drop_log_interval
+        self.spill_dir = spill_dir
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._thread: Optional[threading.Thread] = None
+        # Écritures dans le fichier de débordement (requêtes et thread de vidage)
+        self._spill_lock = threading.Lock()
+        self.written = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.failed = 0
+        # Débordements déjà signalés dans les journaux
+        self._spilled_logged = 0
+        self._spill_logged_at = float("-inf")
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        """Démarre le thread de vidage"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Vide la file puis arrête le thread (à l'arrêt de l'application)"""
+        if not self._thread:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def record(
+        self,
+        action: str,
+        user_id: Optional[int] = None,
+        table_name: Optional[str] = None,
+        record_id: Optional[int] = None,
+        details: Optional[str] = None,
+        ip_address: Optional[str] = None
+    ):
+        """Ajoute une entrée d'audit à la file sans accès à la base ni attente (boucle d'événements)"""
+        entry = {
+            "user_id": user_id,
+            "action": action,
+            "table_name": table_name,
+            "record_id": record_id,
+            "details": details,
+            "ip_address": ip_address,
+            "created_at": datetime.now(),
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            # Base trop lente : l'entrée est ajoutée au fichier de débordement local,
+            # repris par le thread de vidage dès que les écritures aboutissent
+            if self._spill([entry]):
+                self._log_spilled(entry)
+
+    def _spill_path(self, suffix: str = "jsonl") -> str:
+        # Un fichier par processus : les workers n'écrivent jamais dans le même fichier
+        return os.path.join(self.spill_dir, f"audit-{os.getpid()}.{suffix}")
+
+    def _spill(self, entries: List[dict]) -> bool:
+        try:
+            with self._spill_lock:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                with open(self._spill_path(), "a", encoding="utf-8") as spill:
+                    for entry in entries:
+                        spill.write(json.dumps({**entry, "created_at": entry["created_at"].isoformat()}) + "\n")
+        except OSError:
+            # Ni base ni disque : seul cas de perte, compté et signalé
+            self.dropped += len(entries)
+            logger.exception("Perte de %d entrées d'audit (fichier de débordement inaccessible)", len(entries))
+            return False
+        self.spilled += len(entries)
+        return True
+
+    def _log_spilled(self, entry: dict):
+        now = time.monotonic()
+        if now - self._spill_logged_at < self.drop_log_interval:
+            return
+        logger.warning(
+            "File d'audit pleine : %d entrées reportées dans %s (%d au total), dernière : %s %s",
+            self.spilled - self._spilled_logged,
+            self.spill_dir,
+            self.spilled,
+            entry["action"],
+            entry["details"]
+        )
+        self._spilled_logged = self.spilled
+        self._spill_logged_at = now
+
+    def _spill_files(self) -> List[str]:
+        """Fichiers de débordement à reprendre : ceux du processus et ceux des workers arrêtés"""
+        try:
+            names = sorted(os.listdir(self.spill_dir))
+        except FileNotFoundError:
+            return []
+        files = []
+        for name in names:
+            match = SPILL_FILE.fullmatch(name)
+            if match and (int(match.group(1)) == os.getpid() or not _pid_alive(int(match.group(1)))):
+                files.append(os.path.join(self.spill_dir, name))
+        return files
+
+    def _drain_spill(self) -> bool:
+        """Insère en base les entrées débordées ; False si une écriture a échoué"""
+        for path in self._spill_files():
+            draining = self._spill_path("draining")
+            try:
+                with self._spill_lock:
+                    # Renommage atomique : les entrées débordées ensuite vont dans un nouveau fichier
+                    if path != draining:
+                        os.replace(path, draining)
+            except FileNotFoundError:
+                # Repris entre-temps par un autre worker
+                continue
+            with open(draining, encoding="utf-8") as spill:
+                entries = [json.loads(line) for line in spill if line.strip()]
+            # Une entrée en échec est reportée de nouveau dans le fichier du processus
+            ok = True
+            for start in range(0, len(entries), self.batch_size):
+                batch = [
+                    {**entry, "created_at": datetime.fromisoformat(entry["created_at"])}
+                    for entry in entries[start:start + self.batch_size]
+                ]
+                if ok:
+                    ok = self._flush(batch)
+                else:
+                    self._spill(batch)
+            os.remove(draining)
+            if not ok:
+                return False
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[dict] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            if stopping:
+                # Récupérer tout ce qui reste avant l'arrêt
+                while True:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is not _STOP:
+                        batch.append(entry)
+
+            ok = True
+            for start in range(0, len(batch), self.batch_size):
+                ok = self._flush(batch[start:start + self.batch_size]) and ok
+            # Base disponible : reprendre les entrées débordées
+            if ok:
+                self._drain_spill()
+
+    def _flush(self, batch: List[dict]) -> bool:
+        if not batch:
+            return True
+        db = SessionLocal()
+        try:
+            db.execute(insert(AuditLog), batch)
+            db.commit()
+            self.written += len(batch)
+            return True
+        except Exception:
+            db.rollback()
+            self.failed += len(batch)
+            logger.exception("Échec de l'écriture de %d entrées d'audit, reportées sur disque", len(batch))
+            # Base indisponible : l'entrée est conservée pour une prochaine tentative
+            self._spill(batch)
+            return False
+        finally:
+            db.close()
+
+
+# File partagée par le processus
+audit_queue = AuditQueue()
+
+registry.gauge("audit_queue_size", "Entrées d'audit en attente d'écriture", lambda: len(audit_queue))
+registry.counter_func("audit_entries_written", "Entrées d'audit écrites en base", lambda: audit_queue.written)
+registry.counter_func("audit_entries_spilled", "Entrées d'audit reportées dans le fichier de débordement", lambda: audit_queue.spilled)
+registry.counter_func("audit_entries_dropped", "Entrées d'audit perdues (fichier de débordement inaccessible)", lambda: audit_queue.dropped)
+registry.counter_func("audit_entries_failed", "Échecs d'écriture d'entrées d'audit (reportées sur disque)", lambda: audit_queue.failed)
+
+
+class AuditMiddleware:
+    """Middleware ASGI qui audite les accès aux patients et diagnostics"""
+
+    def __init__(self, app, audit: AuditQueue = audit_queue):
+        self.app = app
+        self.audit = audit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        table_name = None
+        for prefix, table in AUDITED_PATHS.items():
+            if path.startswith(prefix):
+                table_name = table
+                break
+        if table_name is None or scope["method"] not in ACTIONS:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.audit.record(
+                action=ACTIONS[scope["method"]],
+                user_id=_user_id_from_scope(scope),
+                table_name=table_name,
+                record_id=_record_id_from_path(path),
+                details=f"{scope['method']} {path} {status_code}",
+                ip_address=scope["client"][0] if scope.get("client") else None
+            )
+
+
+def _user_id_from_scope(scope) -> Optional[int]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return decode_token_subject(token)
+            return None
+    return None
+
+
+def _record_id_from_path(path: str) -> Optional[int]:
+    # /api/patients/{id}[/...] -> id
+    parts = path.split("/")
+    if len(parts) > 3 and parts[3].isdigit():
+        return int(parts[3])
+    return None
+
+
+# --- Archivage mensuel et rétention ---
+
+ARCHIVE_PREFIX = "audit_logs_"
+ARCHIVE_PATTERN = re.compile(r"^audit_logs_(\d{6})$")
+
+_archive_metadata = MetaData()
+
+
+def archive_table(month: str) -> Table:
+    """Table d'archive d'un mois donné (format AAAAMM)"""
+    if not re.fullmatch(r"\d{6}", month):
+        raise ValueError(f"Mois d'archive invalide: {month}")
+    name = f"{ARCHIVE_PREFIX}{month}"
+    table = _archive_metadata.tables.get(name)
+    if table is not None:
+        return table
+    # Même structure que audit_logs, sans clé étrangère vers users
+    return Table(
+        name,
+        _archive_metadata,
+        Column("id", Integer, primary_key=True, autoincrement=False),
+        Column("user_id", Integer),
+        Column("action", String(100), nullable=False),
+        Column("table_name", String(50)),
+        Column("record_id", Integer),
+        Column("details", Text),
+        Column("ip_address", String(45)),
+        Column("created_at", DateTime(timezone=True)),
+        Index(f"ix_{name}_created_at_id", "created_at", "id"),
+        Index(f"ix_{name}_user_created", "user_id", "created_at"),
+        Index(f"ix_{name}_table_record", "table_name", "record_id"),
+    )
+
+
+def list_archive_months() -> List[str]:
+    """Mois disponibles dans les tables d'archive, du plus ancien au plus récent"""
+    return sorted(
+        match.group(1)
+        for match in map(ARCHIVE_PATTERN.match, inspect(engine).get_table_names())
+        if match
+    )
+
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value: datetime) -> datetime:
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def archive_audit_logs(before: datetime, chunk_size: int = AUDIT_ARCHIVE_CHUNK) -> int:
+    """Déplace les entrées antérieures à `before` vers les tables d'archive mensuelles"""
+    live = AuditLog.__table__
+    moved = 0
+    with engine.connect() as conn:
+        oldest = conn.execute(select(func.min(live.c.created_at))).scalar()
+        if oldest is None:
+            return 0
+
+        month = _month_start(oldest)
+        while month < before:
+            end = min(_next_month(month), before)
+            period = and_(live.c.created_at >= month, live.c.created_at < end)
+            min_id, max_id = conn.execute(
+                select(func.min(live.c.id), func.max(live.c.id)).where(period)
+            ).one()
+            if min_id is not None:
+                archive = archive_table(month.strftime("%Y%m"))
+                archive.create(conn, checkfirst=True)
+                conn.commit()
+
+                # Déplacement ensembliste par plages d'ID (transactions bornées)
+                for low in range(min_id, max_id + 1, chunk_size):
+                    in_range = and_(period, live.c.id >= low, live.c.id < low + chunk_size)
+                    conn.execute(
+                        insert(archive).from_select(
+                            [column.name for column in live.columns],
+                            select(*live.columns).where(in_range)
+                        )
+                    )
+                    moved += conn.execute(delete(live).where(in_range)).rowcount
+                    conn.commit()
+
+            # Mois suivant qui contient des entrées : pas de table vide pour les mois sans activité
+            following = conn.execute(
+                select(func.min(live.c.created_at)).where(live.c.created_at >= end)
+            ).scalar()
+            if following is None:
+                break
+            month = _month_start(following)
+    return moved
+
+
+def purge_audit_archives(keep_months: int = AUDIT_RETENTION_MONTHS) -> List[str]:
+    """Supprime en bloc (DROP TABLE) les archives plus anciennes que la rétention"""
+    cutoff = _month_start(datetime.now())
+    for _ in range(keep_months):
+        cutoff = _month_start(cutoff - timedelta(days=1))
+    cutoff_month = cutoff.strftime("%Y%m")
+
+    dropped = []
+    with engine.connect() as conn:
+        for month in list_archive_months():
+            if month < cutoff_month:
+                archive_table(month).drop(conn, checkfirst=True)
+                dropped.append(month)
+        conn.commit()
+    return dropped
+
+
+def apply_audit_retention(
+    hot_days: int = AUDIT_HOT_DAYS,
+    keep_months: int = AUDIT_RETENTION_MONTHS
+) -> tuple[int, List[str]]:
+    """Archive les entrées anciennes puis supprime les archives expirées"""
+    moved = archive_audit_logs(datetime.now() - timedelta(days=hot_days))
+    dropped = purge_audit_archives(keep_months)
+    return moved, dropped
@@ -1,14 +1,16 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.metrics import registry
 from app.models import User
 from app.schemas import UserResponse
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,19 +20,22 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Cryptage des mots de passe
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cryptage des mots de passe (passlib importé au premier usage pour accélérer le démarrage)
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie si le mot de passe correspond au hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Génère un hash du mot de passe"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crée un token JWT"""
@@ -43,6 +48,42 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+@lru_cache(maxsize=4096)
+def _decode_token(token: str) -> Optional[tuple[int, float]]:
+    """Décode un token JWT (résultat mis en cache) et retourne (user_id, expiration)"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id = payload.get("sub")
+        if user_id is None:
+            return None
+        return int(user_id), float(payload.get("exp", 0))
+    except (JWTError, ValueError):
+        return None
+
+def _token_cache_info():
+    return _decode_token.cache_info()
+
+def _token_cache_hit_ratio():
+    info = _decode_token.cache_info()
+    total = info.hits + info.misses
+    return info.hits / total if total else None
+
+registry.counter_func("auth_token_cache_hits", "Décodages de jetons servis par le cache", lambda: _token_cache_info().hits)
+registry.counter_func("auth_token_cache_misses", "Décodages de jetons hors cache", lambda: _token_cache_info().misses)
+registry.gauge("auth_token_cache_hit_ratio", "Taux de succès du cache des jetons", _token_cache_hit_ratio)
+registry.gauge("auth_token_cache_size", "Jetons en cache", lambda: _token_cache_info().currsize)
+
+def decode_token_subject(token: str) -> Optional[int]:
+    """Retourne l'ID utilisateur d'un token JWT valide et non expiré"""
+    decoded = _decode_token(token)
+    if decoded is None:
+        return None
+    user_id, expire = decoded
+    # L'expiration est revérifiée car le décodage est mis en cache
+    if expire and expire < time.time():
+        return None
+    return user_id
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """Authentifie un utilisateur"""
     user = db.query(User).filter(User.email == email).first()
@@ -53,24 +94,25 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     return user
 
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> User:
     """Récupère l'utilisateur actuel depuis le token JWT"""
+    # Utilisateur déjà résolu par la requête englobante (POST /api/batch)
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Impossible de valider les identifiants",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+    user_id = decode_token_subject(token)
+    if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise credentials_exception
     return user
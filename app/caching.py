@@ -0,0 +1,57 @@
+"""
+Requêtes conditionnelles (ETag / If-None-Match)
+Permet aux clients qui interrogent régulièrement l'API de revalider
+leurs données sans retransférer ni resérialiser les réponses.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Response, status
+
+# Les données patients sont nominatives : cache privé, revalidation obligatoire
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Construit un ETag faible à partir des éléments de version d'une ressource"""
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(),
+        digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def content_etag(kind: str, schema, rows, *parts) -> str:
+    """ETag calculé sur le contenu exposé (champs du schéma de réponse) des lignes"""
+    return make_etag(
+        kind, *parts,
+        *(tuple(getattr(row, field) for field in schema.__fields__) for row in rows)
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Vérifie si l'en-tête If-None-Match correspond à l'ETag courant"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparaison faible : le préfixe W/ est ignoré
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def set_etag(response: Response, etag: str):
+    """Ajoute les en-têtes de revalidation à une réponse"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    """Réponse 304 sans corps"""
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_etag(response, etag)
+    return response
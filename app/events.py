@@ -0,0 +1,146 @@
+"""
+Diffusion des mises à jour du tableau de bord (Server-Sent Events)
+Chaque création / suppression de diagnostic validée publie un delta
+(stade, modèle, médecin). Les abonnés reçoivent uniquement les deltas de
+leur périmètre (leur patientèle, ou tout pour les super-administrateurs) ; un
+abonné trop lent est resynchronisé par un instantané au lieu de bloquer
+la diffusion.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from app.metrics import registry
+
+load_dotenv()
+
+# Événements en attente par abonné avant resynchronisation
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "256"))
+# Commentaire de maintien de connexion (secondes)
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+# Instantané périodique (secondes, 0 = désactivé) : rattrape les événements
+# publiés par les autres workers
+SSE_RESYNC_INTERVAL = float(os.getenv("SSE_RESYNC_INTERVAL", "300"))
+
+# Périmètre des super-administrateurs : tous les médecins
+ALL = "*"
+
+
+class Subscriber:
+    """File d'événements déjà encodés d'un client connecté"""
+
+    def __init__(self, scope, queue_size: int = SSE_QUEUE_SIZE):
+        self.scope = scope
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Événements perdus : le client doit repartir d'un instantané
+        self.lagging = False
+
+    def offer(self, payload: bytes):
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.lagging = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            # Réveiller le flux pour qu'il envoie l'instantané
+            self.queue.put_nowait(b"")
+
+
+class StatsBroker:
+    """Abonnés regroupés par médecin ; chaque événement est encodé une seule fois"""
+
+    def __init__(self):
+        self._subscribers: Dict[object, Set[Subscriber]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.sequence = 0
+        self.published = 0
+        self.resyncs = 0
+
+    def __len__(self) -> int:
+        return sum(len(group) for group in self._subscribers.values())
+
+    def subscribe(self, medecin_id: Optional[int]) -> Subscriber:
+        """Abonne un client (medecin_id None = tous les médecins)"""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(ALL if medecin_id is None else medecin_id)
+        self._subscribers.setdefault(subscriber.scope, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        group = self._subscribers.get(subscriber.scope)
+        if group is not None:
+            group.discard(subscriber)
+            if not group:
+                del self._subscribers[subscriber.scope]
+
+    def publish(self, event: str, medecin_id: int, data: dict):
+        """Publie un événement (utilisable depuis la boucle ou un thread du pool)"""
+        with self._lock:
+            self.sequence += 1
+            payload = format_event(event, data, self.sequence)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            self._dispatch(medecin_id, payload)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, medecin_id, payload)
+
+    def _dispatch(self, medecin_id: int, payload: bytes):
+        self.published += 1
+        for scope in (medecin_id, ALL):
+            for subscriber in tuple(self._subscribers.get(scope, ())):
+                subscriber.offer(payload)
+
+    def diagnostic_created(self, diagnostic):
+        self.publish("diagnostic_cree", diagnostic.medecin_id, {
+            "id": diagnostic.id,
+            "patient_id": diagnostic.patient_id,
+            "medecin_id": diagnostic.medecin_id,
+            "resultat": diagnostic.resultat,
+            "modele_utilise": diagnostic.modele_utilise,
+            "probabilite": diagnostic.probabilite,
+            "date": diagnostic.date.isoformat() if diagnostic.date else None,
+        })
+
+    def diagnostics_deleted(self, deleted: Iterable[Tuple[int, int]]):
+        """Publie les suppressions (medecin_id, resultat), regroupées par médecin"""
+        by_medecin: Dict[int, Counter] = {}
+        for medecin_id, resultat in deleted:
+            by_medecin.setdefault(medecin_id, Counter())[resultat] += 1
+        for medecin_id, stades in by_medecin.items():
+            self.publish("diagnostics_supprimes", medecin_id, {
+                "medecin_id": medecin_id,
+                "total": sum(stades.values()),
+                "repartition_fibrose": {str(stade): count for stade, count in sorted(stades.items())},
+            })
+
+
+def format_event(event: str, data: dict, event_id: Optional[int] = None) -> bytes:
+    """Encode un événement au format text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+KEEPALIVE = b": ping\n\n"
+
+# Diffuseur partagé par le processus
+stats_broker = StatsBroker()
+
+registry.gauge("sse_subscribers", "Clients connectés au flux de statistiques", lambda: len(stats_broker))
+registry.counter_func("sse_events_published", "Événements de statistiques diffusés", lambda: stats_broker.published)
+registry.counter_func("sse_resyncs", "Instantanés envoyés aux clients en retard ou reconnectés", lambda: stats_broker.resyncs)
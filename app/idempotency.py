@@ -0,0 +1,178 @@
+"""
+Clés d'idempotence (en-tête Idempotency-Key)
+Une requête rejouée avec la même clé reçoit la réponse déjà calculée ;
+une requête concurrente avec la même clé attend le résultat en cours
+au lieu de relancer le traitement. Les clés sont réservées dans la table
+idempotency_keys, partagée par tous les workers : une tentative répétée
+traitée par un autre worker retrouve la même réponse.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app.database import engine
+from app.models import IdempotencyKey
+
+load_dotenv()
+
+# Durée de conservation des réponses (secondes)
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Réservation d'une requête en cours considérée comme abandonnée (worker arrêté) après ce délai
+IDEMPOTENCY_LEASE = float(os.getenv("IDEMPOTENCY_LEASE", "300"))
+# Attente maximale du résultat d'une requête identique traitée par un autre worker
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+# Intervalle entre deux purges des clés expirées
+IDEMPOTENCY_PURGE_INTERVAL = 300.0
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+_table = IdempotencyKey.__table__
+
+
+def _digest(value: Hashable) -> str:
+    return hashlib.sha256(repr(value).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Réponses par clé d'idempotence, stockées en base avec expiration"""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, lease: float = IDEMPOTENCY_LEASE):
+        self.ttl = ttl
+        self.lease = lease
+        # Requêtes en cours dans ce processus : les doublons attendent sans interroger la base
+        self._pending: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._purged_at = 0.0
+
+    def _claim(self, cle: str, empreinte: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Réserve la clé ; retourne None si réservée, sinon (empreinte, réponse) existantes"""
+        now = datetime.now()
+        with engine.begin() as conn:
+            if time.monotonic() - self._purged_at >= IDEMPOTENCY_PURGE_INTERVAL:
+                self._purged_at = time.monotonic()
+                conn.execute(delete(_table).where(_table.c.expires_at < now))
+            else:
+                conn.execute(delete(_table).where(_table.c.cle == cle, _table.c.expires_at < now))
+            # Requête en cours abandonnée : la clé peut être reprise
+            conn.execute(delete(_table).where(
+                _table.c.cle == cle,
+                _table.c.reponse.is_(None),
+                _table.c.created_at < now - timedelta(seconds=self.lease)
+            ))
+        while True:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(_table).values(
+                        cle=cle,
+                        empreinte=empreinte,
+                        created_at=now,
+                        expires_at=now + timedelta(seconds=self.ttl)
+                    ))
+                return None
+            except IntegrityError:
+                existing = self._fetch(cle)
+                if existing is not None:
+                    return existing
+                # Clé libérée entre-temps : nouvelle tentative
+
+    def _fetch(self, cle: str) -> Optional[Tuple[str, Optional[str]]]:
+        with engine.connect() as conn:
+            row = conn.execute(
+                select(_table.c.empreinte, _table.c.reponse).where(_table.c.cle == cle)
+            ).first()
+        return None if row is None else (row.empreinte, row.reponse)
+
+    def _complete(self, cle: str, reponse: bytes):
+        with engine.begin() as conn:
+            conn.execute(update(_table).where(_table.c.cle == cle).values(reponse=reponse.decode()))
+
+    def _release(self, cle: str):
+        with engine.begin() as conn:
+            conn.execute(delete(_table).where(_table.c.cle == cle, _table.c.reponse.is_(None)))
+
+    async def run(
+        self,
+        key: Hashable,
+        fingerprint: Hashable,
+        func: Callable[[], Awaitable[bytes]]
+    ) -> tuple[bytes, bool]:
+        """Exécute func une seule fois par clé ; retourne (réponse, rejouée)"""
+        cle, empreinte = _digest(key), _digest(fingerprint)
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+
+        while True:
+            pending = self._pending.get(cle)
+            if pending is not None:
+                if pending[0] != empreinte:
+                    raise _conflict()
+                # Requête identique en cours dans ce processus : attendre son résultat
+                return await asyncio.shield(pending[1]), True
+
+            existing = await run_in_threadpool(self._claim, cle, empreinte)
+            if existing is None:
+                return await self._execute(cle, empreinte, func), False
+
+            # Clé déjà réservée (éventuellement par un autre worker)
+            while existing is not None:
+                if existing[0] != empreinte:
+                    raise _conflict()
+                if existing[1] is not None:
+                    return existing[1].encode(), True
+                if time.monotonic() >= deadline:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="Requête avec cette clé d'idempotence en cours de traitement"
+                    )
+                await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+                existing = await run_in_threadpool(self._fetch, cle)
+            # Traitement en échec ailleurs : la clé est libérée, nouvelle tentative de réservation
+
+    async def _execute(self, cle: str, empreinte: str, func: Callable[[], Awaitable[bytes]]) -> bytes:
+        future = asyncio.get_running_loop().create_future()
+        self._pending[cle] = (empreinte, future)
+        try:
+            result = await func()
+        except BaseException as e:
+            # Un échec n'est pas mémorisé : une nouvelle tentative relancera le traitement
+            await run_in_threadpool(self._release, cle)
+            future.set_exception(e)
+            future.exception()  # évite l'avertissement si personne n'attendait
+            raise
+        finally:
+            del self._pending[cle]
+        future.set_result(result)
+        await run_in_threadpool(self._complete, cle, result)
+        return result
+
+
+def _conflict() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Clé d'idempotence déjà utilisée pour une autre requête"
+    )
+
+
+def check_idempotency_key(key: Optional[str]) -> Optional[str]:
+    """Valide l'en-tête Idempotency-Key"""
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="En-tête Idempotency-Key invalide"
+        )
+    return key
+
+
+# Stockage partagé par le processus (clés en base, communes à tous les workers)
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,435 @@
+"""
+Backends d'inférence pour la prédiction de fibrose
+Un backend est choisi pour chaque version de modèle (modele_utilise)
+à partir du registre MODEL_REGISTRY ; les versions non déclarées
+utilisent le backend de simulation.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+from app.metrics import inference_duration
+from app.profiling import span
+from app.server import worker_count
+
+load_dotenv()
+
+# Registre des modèles : chemin d'un fichier JSON ou JSON en ligne
+MODEL_REGISTRY = os.getenv("MODEL_REGISTRY", "models/registry.json")
+
+# Threads ONNX Runtime par session. Plusieurs inférences tournent déjà en
+# parallèle (voir INFERENCE_MAX_CONCURRENCY) : 1 thread intra-op par session
+# évite la sur-souscription des cœurs.
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "1"))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+
+# Variantes d'un modèle ONNX
+VARIANTS = ("fp32", "optimized", "int8")
+
+# Normalisation ImageNet des entrées
+IMAGE_MEAN = (0.485, 0.456, 0.406)
+IMAGE_STD = (0.229, 0.224, 0.225)
+
+
+class InferenceBackend:
+    """Interface commune des backends d'inférence"""
+
+    name = "base"
+
+    def prepare(self):
+        """Prépare les fichiers du modèle sans le charger (avant le fork des workers)"""
+
+    def load(self):
+        """Charge le modèle en mémoire"""
+
+    def unload(self):
+        """Libère le modèle"""
+
+    def predict(self, image_path: str) -> tuple[int, float]:
+        """Retourne (stade de fibrose 0-4, probabilité)"""
+        raise NotImplementedError
+
+    def warmup(self, iterations: int = 10):
+        """Exécute des inférences sur des entrées synthétiques"""
+
+    def memory_bytes(self) -> int:
+        """Taille approximative du modèle en mémoire"""
+        return 0
+
+    def describe(self) -> dict:
+        return {"backend": self.name}
+
+
+class SimulationBackend(InferenceBackend):
+    """
+    Simulation de prédiction de fibrose
+    En production, ceci serait remplacé par votre modèle ML
+    """
+
+    name = "simulation"
+
+    def predict(self, image_path: str) -> tuple[int, float]:
+        resultat = random.randint(0, 4)
+        probabilite = random.uniform(0.6, 0.95)
+        return resultat, probabilite
+
+
+class OnnxBackend(InferenceBackend):
+    """Backend ONNX Runtime (CPU) avec variantes optimisée et quantifiée int8"""
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        variant: str = "fp32",
+        input_size: int = 224,
+        intra_op_threads: int = ONNX_INTRA_OP_THREADS,
+        inter_op_threads: int = ONNX_INTER_OP_THREADS
+    ):
+        if variant not in VARIANTS:
+            raise ValueError(f"Variante inconnue: {variant} (attendu: {', '.join(VARIANTS)})")
+        self.model_path = model_path
+        self.variant = variant
+        self.input_size = input_size
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._session = None
+        self._input_name = None
+
+    @property
+    def variant_path(self) -> str:
+        """Fichier ONNX correspondant à la variante"""
+        if self.variant == "fp32":
+            return self.model_path
+        root, ext = os.path.splitext(self.model_path)
+        return f"{root}.{self.variant}{ext}"
+
+    def prepare(self):
+        path = self.variant_path
+        if not os.path.exists(path):
+            # Variante absente : la générer à partir du modèle fp32
+            if self.variant == "int8":
+                quantize_model(self.model_path, path)
+            elif self.variant == "optimized":
+                optimize_model(self.model_path, path)
+
+    def load(self):
+        ort = _import_onnxruntime()
+        path = self.variant_path
+        self.prepare()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        self._session = ort.InferenceSession(
+            path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+
+    def unload(self):
+        self._session = None
+
+    def preprocess(self, image_path: str):
+        """Image -> tenseur NCHW float32 normalisé"""
+        import numpy as np
+        from PIL import Image
+
+        with Image.open(image_path) as image:
+            image = image.convert("RGB").resize((self.input_size, self.input_size))
+            array = np.asarray(image, dtype=np.float32) / 255.0
+        array = (array - np.asarray(IMAGE_MEAN, dtype=np.float32)) / np.asarray(IMAGE_STD, dtype=np.float32)
+        return array.transpose(2, 0, 1)[np.newaxis, ...]
+
+    def predict(self, image_path: str) -> tuple[int, float]:
+        if self._session is None:
+            self.load()
+        return self._predict_tensor(self.preprocess(image_path))
+
+    def _predict_tensor(self, tensor) -> tuple[int, float]:
+        import numpy as np
+
+        logits = self._session.run(None, {self._input_name: tensor})[0][0]
+        exp = np.exp(logits - np.max(logits))
+        probabilities = exp / exp.sum()
+        resultat = int(np.argmax(probabilities))
+        return resultat, float(probabilities[resultat])
+
+    def warmup(self, iterations: int = 10):
+        import numpy as np
+
+        if self._session is None:
+            self.load()
+        rng = np.random.default_rng(0)
+        shape = (1, 3, self.input_size, self.input_size)
+        for _ in range(iterations):
+            self._predict_tensor(rng.standard_normal(shape, dtype=np.float32))
+
+    def memory_bytes(self) -> int:
+        if self._session is None:
+            return 0
+        return os.path.getsize(self.variant_path)
+
+    def describe(self) -> dict:
+        return {
+            "backend": self.name,
+            "chemin": self.variant_path,
+            "variante": self.variant,
+            "threads_intra_op": self.intra_op_threads,
+            "threads_inter_op": self.inter_op_threads,
+        }
+
+
+def _import_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError:
+        raise RuntimeError(
+            "onnxruntime n'est pas installé. Installez avec: pip install onnxruntime"
+        )
+    return onnxruntime
+
+
+def quantize_model(src_path: str, dst_path: str):
+    """Quantification dynamique int8 des poids d'un modèle ONNX"""
+    _import_onnxruntime()
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src_path, dst_path, weight_type=QuantType.QInt8)
+
+
+def optimize_model(src_path: str, dst_path: str):
+    """Enregistre le graphe optimisé (fusion d'opérateurs) d'un modèle ONNX"""
+    ort = _import_onnxruntime()
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.optimized_model_filepath = dst_path
+    ort.InferenceSession(src_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def create_backend(config: dict) -> InferenceBackend:
+    """Construit un backend à partir d'une entrée du registre"""
+    backend = config.get("backend", "simulation")
+    if backend == "simulation":
+        return SimulationBackend()
+    if backend == "onnx":
+        return OnnxBackend(
+            model_path=config["path"],
+            variant=config.get("variant", "fp32"),
+            input_size=int(config.get("input_size", 224)),
+            intra_op_threads=int(config.get("intra_op_threads", ONNX_INTRA_OP_THREADS)),
+            inter_op_threads=int(config.get("inter_op_threads", ONNX_INTER_OP_THREADS))
+        )
+    raise ValueError(f"Backend d'inférence inconnu: {backend}")
+
+
+def load_registry_config(source: str = MODEL_REGISTRY) -> Dict[str, dict]:
+    """Lit la configuration du registre (fichier JSON ou JSON en ligne)"""
+    if source.lstrip().startswith("{"):
+        return json.loads(source)
+    if os.path.exists(source):
+        with open(source, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Mémoire résidente du processus (Linux), None si indisponible"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class ModelSlot:
+    """Backend actif d'une version, avec le nombre d'inférences en cours"""
+
+    def __init__(self, backend: InferenceBackend, config: dict):
+        self.backend = backend
+        self.config = config
+        self.in_flight = 0
+        self.retired = False
+        self.loaded_at = time.time()
+
+
+class ModelRegistry:
+    """Backends d'inférence par version de modèle, chargés à la demande"""
+
+    def __init__(self, config: Optional[Dict[str, dict]] = None):
+        self._config = load_registry_config() if config is None else config
+        self._slots: Dict[str, ModelSlot] = {}
+        self._swaps: Dict[str, dict] = {}
+        self._default = ModelSlot(SimulationBackend(), {"backend": "simulation"})
+        self._lock = threading.Lock()
+        # Un verrou de chargement par version
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def versions(self) -> list:
+        return sorted(set(self._config) | set(self._slots))
+
+    def _slot(self, version: str) -> ModelSlot:
+        # Chargement hors de self._lock : les autres versions restent disponibles
+        with self._lock:
+            slot = self._slots.get(version)
+            if slot is not None:
+                return slot
+            if version not in self._config:
+                return self._default
+            loading = self._loading.setdefault(version, threading.Lock())
+        with loading:
+            with self._lock:
+                slot = self._slots.get(version)
+                if slot is not None:
+                    return slot
+                config = self._config[version]
+            backend = create_backend(config)
+            backend.load()
+            slot = ModelSlot(backend, config)
+            with self._lock:
+                # Un remplacement a pu aboutir pendant le chargement
+                current = self._slots.setdefault(version, slot)
+            if current is not slot:
+                backend.unload()
+            return current
+
+    def prepare(self):
+        """Génère les variantes manquantes des versions déclarées, sans créer de session"""
+        with self._lock:
+            configs = list(self._config.values())
+        for config in configs:
+            create_backend(config).prepare()
+
+    def load_all(self):
+        """Charge toutes les versions déclarées (sessions propres au processus)"""
+        for version in self.versions():
+            self.get(version)
+
+    def get(self, version: str) -> InferenceBackend:
+        """Backend associé à une version (simulation si non déclarée)"""
+        return self._slot(version).backend
+
+    @contextmanager
+    def acquire(self, version: str):
+        """Réserve le backend courant d'une version pendant une inférence"""
+        while True:
+            slot = self._slot(version)
+            with self._lock:
+                # Version remplacée entre-temps : réserver la nouvelle
+                if not slot.retired:
+                    slot.in_flight += 1
+                    break
+        try:
+            yield slot.backend
+        finally:
+            with self._lock:
+                slot.in_flight -= 1
+                unload = slot.retired and slot.in_flight == 0
+            if unload:
+                slot.backend.unload()
+
+    def predict(self, version: str, image_path: str) -> tuple[int, float]:
+        # Versions non déclarées regroupées sous "simulation" (cardinalité bornée)
+        label = version if version in self._config or version in self._slots else "simulation"
+        with self.acquire(version) as backend, inference_duration.time((label,)), span("inference", label):
+            return backend.predict(image_path)
+
+    def start_swap(self, version: str, config: dict, warmup: int = 10) -> dict:
+        """Charge une nouvelle version en arrière-plan puis la substitue atomiquement"""
+        workers = worker_count()
+        if workers > 1:
+            # Le remplacement ne toucherait qu'un seul des workers
+            raise RuntimeError(
+                f"Remplacement à chaud impossible avec {workers} workers : "
+                "mettre à jour MODEL_REGISTRY puis redémarrer le serveur"
+            )
+        with self._lock:
+            current = self._swaps.get(version)
+            if current and current["etat"] in ("chargement", "prechauffage"):
+                raise RuntimeError("Un remplacement est déjà en cours pour cette version")
+            # Valider la configuration avant de lancer le thread
+            backend = create_backend(config)
+            self._swaps[version] = {
+                "etat": "chargement",
+                "config": config,
+                "debut": time.time(),
+                "erreur": None,
+            }
+        threading.Thread(
+            target=self._swap,
+            args=(version, backend, config, warmup),
+            name=f"model-swap-{version}",
+            daemon=True
+        ).start()
+        return self.swap_status(version)
+
+    def _swap(self, version: str, backend: InferenceBackend, config: dict, warmup: int):
+        swap = self._swaps[version]
+        try:
+            backend.load()
+            # Les deux versions coexistent en mémoire jusqu'à la substitution
+            with self._lock:
+                old = self._slots.get(version)
+            swap.update(
+                etat="prechauffage",
+                memoire_ancienne_version=old.backend.memory_bytes() if old else 0,
+                memoire_nouvelle_version=backend.memory_bytes(),
+                memoire_processus=process_rss_bytes()
+            )
+            backend.warmup(warmup)
+        except Exception as e:
+            swap.update(etat="echec", erreur=str(e), fin=time.time())
+            backend.unload()
+            return
+
+        with self._lock:
+            old = self._slots.get(version)
+            self._slots[version] = ModelSlot(backend, config)
+            self._config[version] = config
+            if old is not None:
+                old.retired = True
+                unload = old.in_flight == 0
+            else:
+                unload = False
+        # Les inférences en cours terminent sur l'ancien modèle, libéré ensuite
+        if unload:
+            old.backend.unload()
+        swap.update(etat="actif", fin=time.time())
+
+    def swap_status(self, version: str) -> Optional[dict]:
+        swap = self._swaps.get(version)
+        return dict(swap) if swap else None
+
+    def status(self) -> dict:
+        """État des versions chargées et des remplacements en cours"""
+        with self._lock:
+            slots = dict(self._slots)
+        return {
+            # État propre au worker qui répond
+            "pid": os.getpid(),
+            "workers": worker_count(),
+            "memoire_processus": process_rss_bytes(),
+            "versions": {
+                version: {
+                    **(slots[version].backend.describe() if version in slots else self._config[version]),
+                    "charge": version in slots,
+                    "inferences_en_cours": slots[version].in_flight if version in slots else 0,
+                    "memoire_modele": slots[version].backend.memory_bytes() if version in slots else 0,
+                    "remplacement": self.swap_status(version),
+                }
+                for version in self.versions()
+            },
+        }
+
+
+# Registre partagé par le processus
+model_registry = ModelRegistry()
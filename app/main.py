@@ -1,13 +1,14 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from app.routers import auth, patients, diagnostics, stats, admin, batch
+from app.audit import AuditMiddleware, audit_queue
+from app.metrics import MetricsMiddleware, METRICS_TOKEN, CONTENT_TYPE, registry, metrics_exporter
+from app.profiling import ProfilingMiddleware, install_sql_spans
 from app.database import engine
-from app.models import Base
-from app.routers import auth, patients, diagnostics, stats
 import os
 
-# Créer les tables
-Base.metadata.create_all(bind=engine)
+# Le schéma est géré par les migrations Alembic (voir start.py / alembic.ini)
 
 # Créer l'application FastAPI
 app = FastAPI(
@@ -27,6 +28,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Journalisation d'audit des accès patients / diagnostics
+app.add_middleware(AuditMiddleware)
+
+# Profilage à la demande (en-tête X-Profile pour les administrateurs, ou échantillonnage)
+app.add_middleware(ProfilingMiddleware)
+install_sql_spans(engine)
+
+# Métriques par route (ajouté en dernier : englobe les autres middlewares)
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def start_audit():
+    audit_queue.start()
+
+@app.on_event("shutdown")
+async def stop_audit():
+    # Vider les entrées d'audit en attente avant l'arrêt
+    audit_queue.stop()
+
+@app.on_event("startup")
+async def start_metrics_export():
+    # Mode multi-workers : export des métriques du worker pour l'agrégation de /metrics
+    metrics_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_metrics_export():
+    metrics_exporter.stop()
+
 # Monter les fichiers statiques pour les images uploadées
 if os.path.exists("uploads"):
     app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -36,6 +65,8 @@ app.include_router(auth.router, prefix="/api")
 app.include_router(patients.router, prefix="/api")
 app.include_router(diagnostics.router, prefix="/api")
 app.include_router(stats.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(batch.router, prefix="/api")
 
 @app.get("/")
 async def root():
@@ -51,6 +82,13 @@ async def health_check():
     """Vérification de l'état de l'API"""
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Métriques au format Prometheus"""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Jeton de métriques invalide")
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
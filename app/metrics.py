@@ -0,0 +1,469 @@
+"""
+Métriques au format Prometheus (endpoint /metrics)
+Les compteurs et histogrammes sont répartis en fragments par thread :
+chaque thread écrit dans son propre dictionnaire, sans verrou ; les
+fragments ne sont additionnés qu'au moment de la collecte.
+Avec plusieurs workers (METRICS_DIR défini par app/server.py), chaque
+processus exporte ses valeurs dans METRICS_DIR/<pid>.json ; /metrics
+additionne les compteurs et histogrammes de tous les workers et étiquette
+les jauges par pid.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Jeton optionnel exigé par /metrics (en-tête Authorization: Bearer <jeton>)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Intervalle d'export des métriques de chaque worker (mode multi-workers)
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "5"))
+
+# Bornes par défaut des histogrammes de durée (secondes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shards:
+    """Un dictionnaire par thread ; seul l'enregistrement d'un nouveau thread prend le verrou"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[dict] = []
+
+    def local(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def copies(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy est atomique sous le GIL
+        return [shard.copy() for shard in shards]
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, Tuple, float]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Compteur monotone"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._shards = _Shards()
+
+    def inc(self, amount: float = 1, labels: Tuple = ()):
+        shard = self._shards.local()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        totals: Dict[Tuple, float] = {}
+        for shard in self._shards.copies():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield self.name + "_total", self._pairs(labels), value
+
+    def _pairs(self, labels: Tuple) -> Tuple:
+        return tuple(zip(self.labelnames, labels))
+
+
+class Histogram(_Metric):
+    """Histogramme à bornes fixes"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards()
+
+    def observe(self, value: float, labels: Tuple = ()):
+        shard = self._shards.local()
+        # [effectif par intervalle..., +Inf, somme]
+        counts = shard.get(labels)
+        if counts is None:
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, labels: Tuple = ()) -> "_Timer":
+        """Mesure la durée d'un bloc with"""
+        return _Timer(self, labels)
+
+    def values(self) -> Dict[Tuple, List[float]]:
+        totals: Dict[Tuple, List[float]] = {}
+        for shard in self._shards.copies():
+            for labels, counts in shard.items():
+                total = totals.setdefault(labels, [0] * len(counts))
+                for i, value in enumerate(list(counts)):
+                    total[i] += value
+        return totals
+
+    def samples(self):
+        for labels, counts in sorted(self.values().items()):
+            pairs = tuple(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket", pairs + (("le", _format_value(bound)),), cumulative
+            yield self.name + "_sum", pairs, counts[-1]
+            yield self.name + "_count", pairs, cumulative
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.labels)
+
+
+class Gauge(_Metric):
+    """Jauge calculée à la collecte par une fonction (valeur ou {labels: valeur})"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], object],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.func = func
+
+    def samples(self):
+        value = self.func()
+        if value is None:
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, sample in sorted(value.items()):
+            yield self.name, tuple(zip(self.labelnames, labels)), sample
+
+
+class CounterFunc(Gauge):
+    """Compteur dont la valeur est lue à la collecte (compteurs déjà tenus ailleurs)"""
+
+    type_name = "counter"
+
+    def samples(self):
+        for name, pairs, value in super().samples():
+            yield name + "_total", pairs, value
+
+
+class Registry:
+    """Ensemble des métriques exposées"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], object],
+        labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, func, labelnames))
+
+    def counter_func(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], object],
+        labelnames: Sequence[str] = ()
+    ) -> CounterFunc:
+        return self.register(CounterFunc(name, documentation, func, labelnames))
+
+    def collect(self) -> List[dict]:
+        """Familles de métriques du processus (nom, aide, type, échantillons)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        families = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # Une jauge en échec ne doit pas empêcher la collecte des autres
+                continue
+            families.append({
+                "name": metric.name,
+                "help": metric.documentation,
+                "type": metric.type_name,
+                "samples": samples,
+            })
+        return families
+
+    def export(self, directory: str):
+        """Écrit les métriques du processus dans directory/<pid>.json (remplacement atomique)"""
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.collect(), f)
+        os.replace(tmp_path, path)
+
+    def render(self) -> str:
+        """Format texte d'exposition Prometheus (tous les workers si METRICS_DIR est défini)"""
+        directory = os.getenv("METRICS_DIR")
+        if not directory:
+            return _render(self.collect())
+        # Valeurs fraîches pour le worker qui répond
+        self.export(directory)
+        return _render(merge_exports(directory))
+
+
+def merge_exports(directory: str) -> List[dict]:
+    """Agrège les exports des workers : compteurs et histogrammes additionnés, jauges par pid"""
+    families: Dict[str, dict] = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            pid = int(filename[:-len(".json")])
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                exported = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Les compteurs d'un worker arrêté (recyclé) restent comptés, pas ses jauges
+        alive = _pid_alive(pid)
+        for family in exported:
+            merged = families.setdefault(family["name"], {**family, "samples": {}})
+            samples = merged["samples"]
+            if family["type"] == "gauge":
+                if not alive:
+                    continue
+                for name, pairs, value in family["samples"]:
+                    samples[(name, tuple(map(tuple, pairs)) + (("pid", str(pid)),))] = value
+            else:
+                for name, pairs, value in family["samples"]:
+                    key = (name, tuple(map(tuple, pairs)))
+                    samples[key] = samples.get(key, 0) + value
+    return [
+        {**family, "samples": [(name, pairs, value) for (name, pairs), value in family["samples"].items()]}
+        for family in families.values()
+    ]
+
+
+def clear_exports(directory: str):
+    """Supprime les exports d'une exécution précédente (avant le démarrage des workers)"""
+    for filename in os.listdir(directory):
+        if filename.endswith((".json", ".json.tmp")):
+            os.remove(os.path.join(directory, filename))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _render(families: List[dict]) -> str:
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family['name']} {_escape_help(family['help'])}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, pairs, value in family["samples"]:
+            if pairs:
+                label_text = ",".join(f'{key}="{_escape_label(str(val))}"' for key, val in pairs)
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Thread d'export périodique des métriques du worker (mode multi-workers uniquement)"""
+
+    def __init__(self, metrics: "Registry", interval: float = METRICS_EXPORT_INTERVAL):
+        self.metrics = metrics
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not os.getenv("METRICS_DIR") or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread après un dernier export (compteurs du worker conservés)"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            stopping = self._stop.wait(self.interval)
+            directory = os.getenv("METRICS_DIR")
+            try:
+                self.metrics.export(directory)
+            except OSError:
+                # Répertoire indisponible : nouvel essai à l'intervalle suivant
+                pass
+            if stopping:
+                return
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Registre partagé par le processus
+registry = Registry()
+metrics_exporter = MetricsExporter(registry)
+
+# Requêtes HTTP (étiquetées par gabarit de route pour borner la cardinalité)
+http_requests = registry.counter(
+    "http_requests",
+    "Requêtes HTTP traitées",
+    ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Durée de traitement des requêtes HTTP",
+    ("method", "route")
+)
+
+# Téléversements d'images
+upload_bytes = registry.counter("upload_bytes", "Octets d'images téléversées écrits sur disque")
+upload_duration = registry.histogram(
+    "upload_duration_seconds",
+    "Durée d'écriture des images téléversées"
+)
+
+# Inférence
+inference_duration = registry.histogram(
+    "inference_duration_seconds",
+    "Durée des prédictions par version de modèle",
+    ("modele",)
+)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI qui mesure le nombre et la durée des requêtes par route"""
+
+    UNMATCHED = "unmatched"
+
+    def __init__(self, app):
+        self.app = app
+        # endpoint -> gabarit de route, construit au premier passage
+        self._routes: Optional[Dict[object, str]] = None
+
+    def _route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return self.UNMATCHED
+        if self._routes is None:
+            routes = {}
+            for route in getattr(scope.get("app"), "routes", ()):
+                target = getattr(route, "endpoint", None) or getattr(route, "app", None)
+                if target is not None:
+                    routes.setdefault(target, route.path)
+            self._routes = routes
+        return self._routes.get(endpoint, self.UNMATCHED)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route_template(scope)
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - start, (method, route))
+            http_requests.inc(1, (method, route, str(status_code)))
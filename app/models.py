@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -45,7 +45,11 @@ class Patient(Base):
     
     # Relations
     medecin = relationship("User", back_populates="patients")
-    diagnostics = relationship("Diagnostic", back_populates="patient")
+    diagnostics = relationship(
+        "Diagnostic",
+        back_populates="patient",
+        order_by="(Diagnostic.date.desc(), Diagnostic.id.desc())"
+    )
 
 class Diagnostic(Base):
     __tablename__ = "diagnostics"
@@ -67,6 +71,12 @@ class Diagnostic(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Index des requêtes de conformité (pagination par clé sur created_at, id)
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_user_created", "user_id", "created_at"),
+        Index("ix_audit_logs_table_record", "table_name", "record_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -75,4 +85,18 @@ class AuditLog(Base):
     record_id = Column(Integer)
     details = Column(Text)
     ip_address = Column(String(45))
-    created_at = Column(DateTime(timezone=True), server_default=func.now()) 
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now()) 
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+    
+    # Empreintes SHA-256 (utilisateur + clé, paramètres de la requête)
+    cle = Column(String(64), primary_key=True)
+    empreinte = Column(String(64), nullable=False)
+    reponse = Column(Text)  # NULL tant que la requête est en cours
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,293 @@
+"""
+Profilage à la demande des requêtes
+Une requête est profilée si elle porte l'en-tête X-Profile (administrateurs
+uniquement) ou si elle est tirée au sort (PROFILE_SAMPLE_RATE). Un thread
+échantillonne les piles des threads qui servent la requête ; le résultat est
+écrit au format « folded » (flamegraph.pl, speedscope, inferno), accompagné
+des durées des requêtes SQL et des inférences.
+"""
+
+import contextvars
+import json
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+
+load_dotenv()
+
+# Configuration du profilage
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Nombre maximal de profils conservés sur disque (les plus anciens sont supprimés)
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+# Intervalle d'échantillonnage des piles (secondes)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+# Profils simultanés au plus (les autres requêtes ne sont pas profilées)
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+PROFILE_HEADER = b"x-profile"
+# Longueur maximale des requêtes SQL conservées dans les spans
+SQL_MAX_LENGTH = 500
+
+PROFILE_ID = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}$")
+
+_current: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "request_profile", default=None
+)
+
+
+class RequestProfile:
+    """Échantillons de piles et spans d'une requête profilée"""
+
+    def __init__(self, method: str, path: str, interval: float = PROFILE_INTERVAL):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.spans: List[dict] = []
+        # Threads qui travaillent pour la requête (boucle + pool de threads)
+        self.threads = {threading.get_ident()}
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.id}", daemon=True)
+
+    def start_sampling(self):
+        self._sampler.start()
+
+    def stop_sampling(self, status_code: Optional[int]):
+        self.duration = time.perf_counter() - self.start
+        self.status_code = status_code
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in tuple(self.threads):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                if ident not in names:
+                    thread = next((t for t in threading.enumerate() if t.ident == ident), None)
+                    names[ident] = thread.name if thread else str(ident)
+                self.stacks[_fold(frame, names[ident])] += 1
+                self.samples += 1
+
+    def attach_thread(self):
+        self.threads.add(threading.get_ident())
+
+    def add_span(self, kind: str, name: str, start: float, end: float):
+        self.spans.append({
+            "type": kind,
+            "nom": name,
+            "debut_ms": round((start - self.start) * 1000, 3),
+            "duree_ms": round((end - start) * 1000, 3),
+        })
+
+    def metadata(self) -> dict:
+        sql = [span for span in self.spans if span["type"] == "sql"]
+        return {
+            "id": self.id,
+            "methode": self.method,
+            "chemin": self.path,
+            "statut": self.status_code,
+            "date": self.started_at,
+            "duree_ms": round((self.duration or 0) * 1000, 3),
+            "echantillons": self.samples,
+            "intervalle_ms": self.interval * 1000,
+            "requetes_sql": len(sql),
+            "duree_sql_ms": round(sum(span["duree_ms"] for span in sql), 3),
+            "spans": self.spans,
+        }
+
+    def write(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        """Écrit le profil (.folded + .json) puis applique la limite de rotation"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.id}.folded"), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(directory, f"{self.id}.json"), "w") as f:
+            json.dump(self.metadata(), f, ensure_ascii=False)
+        rotate_profiles(directory, max_files)
+
+
+def _fold(frame, thread_name: str) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+def _short_path(filename: str) -> str:
+    for marker in ("site-packages" + os.sep, os.getcwd() + os.sep, sysconfig.get_paths()["stdlib"] + os.sep):
+        index = filename.find(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    return filename
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """Mesure un bloc dans le profil de la requête courante (sans effet sinon)"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile.attach_thread()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(kind, name, start, time.perf_counter())
+
+
+def install_sql_spans(engine):
+    """Enregistre la durée de chaque requête SQL exécutée pendant un profil"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        if profile is not None:
+            profile.attach_thread()
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        starts = conn.info.get("profile_start")
+        if profile is not None and starts:
+            profile.add_span("sql", " ".join(statement.split())[:SQL_MAX_LENGTH], starts.pop(), time.perf_counter())
+
+
+def rotate_profiles(directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+    """Supprime les profils les plus anciens au-delà de max_files"""
+    profile_ids = list_profile_ids(directory)
+    for profile_id in profile_ids[max_files:]:
+        for extension in (".folded", ".json"):
+            try:
+                os.remove(os.path.join(directory, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profile_ids(directory: str = PROFILE_DIR) -> List[str]:
+    """Identifiants des profils présents, du plus récent au plus ancien"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    ids = {name.rsplit(".", 1)[0] for name in names if name.endswith((".folded", ".json"))}
+    # L'identifiant commence par l'horodatage : l'ordre lexical est chronologique
+    return sorted((i for i in ids if PROFILE_ID.match(i)), reverse=True)
+
+
+def load_profile_metadata(profile_id: str, directory: str = PROFILE_DIR) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, f"{profile_id}.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def profile_path(profile_id: str, directory: str = PROFILE_DIR) -> Optional[str]:
+    """Chemin du fichier folded d'un profil (None si l'identifiant est invalide ou absent)"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(directory, f"{profile_id}.folded")
+    return path if os.path.exists(path) else None
+
+
+def _is_admin_token(headers) -> bool:
+    from app.auth import decode_token_subject
+    from app.database import SessionLocal
+    from app.models import User, UserRole
+
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            user_id = decode_token_subject(token) if scheme.lower() == "bearer" and token else None
+            if user_id is None:
+                return False
+            db = SessionLocal()
+            try:
+                role = db.query(User.role).filter(User.id == user_id).scalar()
+            finally:
+                db.close()
+            return role in (UserRole.ADMIN, UserRole.SUPER_ADMIN)
+    return False
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI qui profile les requêtes demandées ou échantillonnées"""
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        directory: str = PROFILE_DIR,
+        max_concurrent: int = PROFILE_MAX_CONCURRENT
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_concurrent = max_concurrent
+        self._running = 0
+
+    async def _wants_profile(self, scope) -> bool:
+        requested = any(
+            name == PROFILE_HEADER and value.strip().lower() not in (b"", b"0", b"false")
+            for name, value in scope["headers"]
+        )
+        if requested:
+            return await run_in_threadpool(_is_admin_token, scope["headers"])
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._running >= self.max_concurrent:
+            await self.app(scope, receive, send)
+            return
+        if not await self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        status_code = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        self._running += 1
+        token = _current.set(profile)
+        profile.start_sampling()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            profile.stop_sampling(status_code)
+            self._running -= 1
+            await run_in_threadpool(profile.write, self.directory)
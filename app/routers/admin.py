@@ -0,0 +1,189 @@
+import base64
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
+from sqlalchemy import and_, or_, select, union_all
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import User, AuditLog
+from app.schemas import AuditLogResponse, AuditLogPage, ModelLoadRequest
+from app.auth import require_role
+from app.audit import archive_table, list_archive_months
+from app.admission import inference_limiter
+from app.inference import model_registry
+from app.profiling import list_profile_ids, load_profile_metadata, profile_path
+
+router = APIRouter(prefix="/admin", tags=["administration"])
+
+def encode_cursor(created_at: datetime, record_id: int) -> str:
+    """Encode la position (created_at, id) de la dernière entrée d'une page"""
+    raw = f"{created_at.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Décode un curseur de pagination"""
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(record_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
+
+def _archive_months_between(start: Optional[datetime], end: Optional[datetime]) -> list[str]:
+    """Mois archivés qui recoupent la période [start, end)"""
+    first = start.strftime("%Y%m") if start else None
+    last = (end - timedelta(days=1)).strftime("%Y%m") if end else None
+    return [
+        month for month in list_archive_months()
+        if (first is None or month >= first) and (last is None or month <= last)
+    ]
+
+@router.get("/audit", response_model=AuditLogPage)
+async def get_audit_logs(
+    user_id: Optional[int] = Query(None),
+    table_name: Optional[str] = Query(None),
+    record_id: Optional[int] = Query(None),
+    action: Optional[str] = Query(None),
+    start_date: str = Query(None, description="Date de début (YYYY-MM-DD)"),
+    end_date: str = Query(None, description="Date de fin (YYYY-MM-DD)"),
+    archive: Optional[str] = Query(None, pattern=r"^\d{6}$", description="Mois archivé seul (AAAAMM)"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    """Consulter le journal d'audit, archives de la période incluses (pagination par curseur, plus récent d'abord)"""
+    start_dt = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+    end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else None
+    cursor_position = decode_cursor(cursor) if cursor else None
+
+    if archive:
+        if archive not in list_archive_months():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Archive non trouvée"
+            )
+        tables = [archive_table(archive)]
+    else:
+        # Table courante et archives mensuelles qui recoupent la période demandée
+        tables = [AuditLog.__table__] + [
+            archive_table(month) for month in _archive_months_between(start_dt, end_dt)
+        ]
+
+    def page_query(table):
+        query = select(table)
+        if user_id is not None:
+            query = query.where(table.c.user_id == user_id)
+        if table_name:
+            query = query.where(table.c.table_name == table_name)
+        if record_id is not None:
+            query = query.where(table.c.record_id == record_id)
+        if action:
+            query = query.where(table.c.action == action)
+        if start_dt:
+            query = query.where(table.c.created_at >= start_dt)
+        if end_dt:
+            query = query.where(table.c.created_at < end_dt)
+
+        # Pagination par clé (created_at, id) : coût constant quelle que soit la page
+        if cursor_position:
+            cursor_created_at, cursor_id = cursor_position
+            query = query.where(or_(
+                table.c.created_at < cursor_created_at,
+                and_(table.c.created_at == cursor_created_at, table.c.id < cursor_id)
+            ))
+        return query.order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit + 1)
+
+    if len(tables) == 1:
+        query = page_query(tables[0])
+    else:
+        # Une page par table (index created_at, id) puis fusion : les ID sont conservés
+        # à l'archivage, la clé (created_at, id) reste unique entre les tables
+        pages = union_all(*(select(page_query(table).subquery()) for table in tables)).subquery()
+        query = select(pages).order_by(pages.c.created_at.desc(), pages.c.id.desc()).limit(limit + 1)
+
+    rows = db.execute(query).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return AuditLogPage(
+        items=[AuditLogResponse(**row._mapping) for row in rows],
+        next_cursor=next_cursor
+    )
+
+@router.get("/audit/archives")
+async def get_audit_archives(
+    current_user: User = Depends(require_role("admin"))
+):
+    """Lister les mois d'audit archivés"""
+    return list_archive_months()
+
+@router.get("/inference")
+async def get_inference_status(
+    current_user: User = Depends(require_role("admin"))
+):
+    """État de la file d'inférence (places actives, file d'attente, refus)"""
+    return inference_limiter.stats()
+
+@router.get("/models")
+async def get_models(
+    current_user: User = Depends(require_role("admin"))
+):
+    """Versions de modèles chargées, inférences en cours et mémoire utilisée"""
+    return model_registry.status()
+
+@router.post("/models/{version}/load", status_code=status.HTTP_202_ACCEPTED)
+async def load_model(
+    version: str,
+    request: ModelLoadRequest,
+    current_user: User = Depends(require_role("admin"))
+):
+    """Charger une version de modèle en arrière-plan puis la substituer sans interruption"""
+    config = request.dict(exclude={"warmup"}, exclude_none=True)
+    try:
+        return model_registry.start_swap(version, config, warmup=request.warmup)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except (KeyError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Configuration de modèle invalide: {e}"
+        )
+
+
+@router.get("/profiles")
+async def list_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(require_role("admin"))
+):
+    """Profils de requêtes enregistrés, du plus récent au plus ancien"""
+    profiles = []
+    for profile_id in list_profile_ids()[:limit]:
+        metadata = load_profile_metadata(profile_id)
+        if metadata is not None:
+            metadata.pop("spans", None)
+            profiles.append(metadata)
+    return profiles
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("folded", pattern="^(folded|json)$"),
+    current_user: User = Depends(require_role("admin"))
+):
+    """Télécharge un profil (piles « folded » pour flamegraph, ou détail JSON avec les spans)"""
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profil non trouvé"
+        )
+    if format == "json":
+        return load_profile_metadata(profile_id)
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
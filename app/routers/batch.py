@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import os
+from typing import List
+from urllib.parse import urlencode
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import User
+from app.schemas import BatchRequest, BatchSubRequest, BatchSubResponse, BatchResponse
+from app.auth import get_current_active_user
+
+router = APIRouter(tags=["batch"])
+
+logger = logging.getLogger(__name__)
+
+# Sous-requêtes acceptées par appel
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+# Chemins exclus : récursion et flux sans fin
+BATCH_EXCLUDED_PATHS = ("/api/batch", "/api/stats/stream")
+# En-têtes qu'une sous-requête peut fournir (l'authentification est celle du lot)
+BATCH_ALLOWED_HEADERS = {"accept", "if-none-match", "idempotency-key"}
+# En-têtes de la requête du lot propres à son corps, non transmis
+PARENT_EXCLUDED_HEADERS = {b"content-length", b"content-type", b"transfer-encoding", b"if-none-match", b"idempotency-key"}
+
+
+def _check_sub_request(sub: BatchSubRequest):
+    path = sub.chemin.split("?", 1)[0]
+    if path.rstrip("/") in BATCH_EXCLUDED_PATHS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chemin non autorisé dans un lot: {path}"
+        )
+    for name in (sub.en_tetes or {}):
+        if name.lower() not in BATCH_ALLOWED_HEADERS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"En-tête non autorisé dans un lot: {name}"
+            )
+
+
+async def run_sub_request(request: Request, sub: BatchSubRequest, state: dict) -> BatchSubResponse:
+    """Exécute une sous-requête dans l'application (middlewares compris) sans passer par le réseau"""
+    path, _, query = sub.chemin.partition("?")
+    if sub.params:
+        extra = urlencode(sub.params, doseq=True)
+        query = f"{query}&{extra}" if query else extra
+
+    headers = [
+        (name, value) for name, value in request.scope["headers"]
+        if name not in PARENT_EXCLUDED_HEADERS
+    ]
+    headers += [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (sub.en_tetes or {}).items()]
+    body = b""
+    if sub.corps is not None:
+        body = json.dumps(sub.corps).encode()
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "scheme": request.scope.get("scheme", "http"),
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "method": sub.methode,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        # Utilisateur partagé par le lot
+        "state": state,
+    }
+
+    finished = asyncio.Event()
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    response_status = 500
+    response_headers = {}
+    chunks: List[bytes] = []
+
+    async def send(message):
+        nonlocal response_status, response_headers
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+            response_headers = {
+                name.decode("latin-1"): value.decode("latin-1")
+                for name, value in message.get("headers", [])
+                if name != b"content-length"
+            }
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # Erreur non gérée (déjà convertie en 500 puis relancée par Starlette) :
+        # seule cette sous-requête échoue, pas le lot
+        logger.exception("Erreur dans la sous-requête %s %s", sub.methode, path)
+        return BatchSubResponse(
+            id=sub.id,
+            statut=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            en_tetes={"content-type": "application/json"},
+            corps={"detail": "Erreur interne du serveur"}
+        )
+    finally:
+        finished.set()
+
+    content = b"".join(chunks)
+    if not content:
+        corps = None
+    elif response_headers.get("content-type", "").startswith("application/json"):
+        corps = json.loads(content)
+    else:
+        corps = content.decode(errors="replace")
+    return BatchSubResponse(id=sub.id, statut=response_status, en_tetes=response_headers, corps=corps)
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def batch(
+    batch_request: BatchRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Exécuter plusieurs requêtes de l'API en un seul aller-retour"""
+    if len(batch_request.requetes) > BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Au plus {BATCH_MAX_REQUESTS} requêtes par lot"
+        )
+    for sub in batch_request.requetes:
+        _check_sub_request(sub)
+
+    # Utilisateur détaché de la session du lot (attributs déjà chargés) : partagé en lecture
+    # seule par les sous-requêtes, qui ouvrent chacune leur propre session
+    await run_in_threadpool(db.close)
+    state = {"user": current_user}
+
+    # Les GET consécutifs s'exécutent en parallèle ; une écriture attend la fin des
+    # lectures qui la précèdent et se termine avant celles qui la suivent
+    reponses: List[BatchSubResponse] = []
+    lectures: List[BatchSubRequest] = []
+    for sub in batch_request.requetes:
+        if sub.methode == "GET":
+            lectures.append(sub)
+            continue
+        reponses += await asyncio.gather(*(run_sub_request(request, lecture, state) for lecture in lectures))
+        lectures = []
+        reponses.append(await run_sub_request(request, sub, state))
+    reponses += await asyncio.gather(*(run_sub_request(request, lecture, state) for lecture in lectures))
+
+    return BatchResponse(reponses=reponses)
@@ -1,11 +1,20 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, UploadFile, File, Header, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import delete, func, select
 from app.database import get_db
 from app.models import User, Patient, Diagnostic
-from app.schemas import DiagnosticCreate, DiagnosticResponse
+from app.schemas import DiagnosticCreate, DiagnosticResponse, DiagnosticBulkDelete, BulkDeleteResponse
 from app.auth import require_role
+from app.analytics import snapshot
+from app.events import stats_broker
+from app.caching import content_etag, etag_matches, set_etag, not_modified
+from app.serialization import parse_fields, use_fast_path, json_list_response
+from app.idempotency import idempotency_store, check_idempotency_key
+from app.admission import inference_limiter
+from app.inference import model_registry
+from app.metrics import upload_bytes, upload_duration
 import os
 import uuid
 from datetime import datetime
@@ -23,21 +32,27 @@ def save_upload_file(upload_file: UploadFile) -> str:
     file_name = f"{uuid.uuid4()}{file_extension}"
     file_path = os.path.join(UPLOAD_DIR, file_name)
     
-    with open(file_path, "wb") as buffer:
+    with upload_duration.time(), open(file_path, "wb") as buffer:
         shutil.copyfileobj(upload_file.file, buffer)
+        upload_bytes.inc(buffer.tell())
     
     return file_path
 
-def predict_fibrosis(image_path: str) -> tuple[int, float]:
-    """
-    Simulation de prédiction de fibrose
-    En production, ceci serait remplacé par votre modèle ML
-    """
-    # Simulation - en réalité, vous chargeriez votre modèle ici
-    import random
-    resultat = random.randint(0, 4)
-    probabilite = random.uniform(0.6, 0.95)
-    return resultat, probabilite
+def remove_upload_files(paths: List[Optional[str]]):
+    """Supprime des images uploadées (tâche d'arrière-plan)"""
+    upload_root = os.path.realpath(UPLOAD_DIR)
+    for path in paths:
+        # Seuls les fichiers du répertoire d'upload sont supprimés (pas les URLs externes)
+        if not path or not os.path.realpath(path).startswith(upload_root + os.sep):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def predict_fibrosis(image_path: str, modele_utilise: str) -> tuple[int, float]:
+    """Prédit le stade de fibrose avec le backend associé à la version du modèle"""
+    return model_registry.predict(modele_utilise, image_path)
 
 @router.post("/", response_model=DiagnosticResponse)
 async def create_diagnostic(
@@ -45,57 +60,142 @@ async def create_diagnostic(
     modele_utilise: str = "Vision Transformer v2.1",
     notes: Optional[str] = None,
     image: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("medecin"))
 ):
     """Créer un nouveau diagnostic avec upload d'image"""
-    # Vérifier que le patient existe et appartient au médecin
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if not patient:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Patient non trouvé"
+    idempotency_key = check_idempotency_key(idempotency_key)
+
+    async def process() -> DiagnosticResponse:
+        # Vérifier que le patient existe et appartient au médecin
+        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        if not patient:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Patient non trouvé"
+            )
+        
+        if patient.medecin_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Accès non autorisé à ce patient"
+            )
+        
+        # Inférence limitée en concurrence (refus rapide si le service est saturé)
+        async with inference_limiter.slot(current_user.id):
+            # Sauvegarder l'image
+            image_path = await run_in_threadpool(save_upload_file, image)
+            
+            # Prédire la fibrose
+            resultat, probabilite = await run_in_threadpool(
+                predict_fibrosis, image_path, modele_utilise
+            )
+        
+        # Créer le diagnostic
+        db_diagnostic = Diagnostic(
+            patient_id=patient_id,
+            medecin_id=current_user.id,
+            modele_utilise=modele_utilise,
+            resultat=resultat,
+            probabilite=probabilite,
+            image_url=image_path,
+            notes=notes
         )
-    
-    if patient.medecin_id != current_user.id:
+        
+        db.add(db_diagnostic)
+        db.commit()
+        db.refresh(db_diagnostic)
+        stats_broker.diagnostic_created(db_diagnostic)
+        
+        return DiagnosticResponse.from_orm(db_diagnostic)
+
+    if idempotency_key is None:
+        return await process()
+
+    # Les tentatives répétées (réseau instable) réutilisent la réponse initiale
+    async def process_json() -> bytes:
+        return (await process()).model_dump_json().encode()
+
+    body, replayed = await idempotency_store.run(
+        (current_user.id, idempotency_key),
+        (patient_id, modele_utilise, notes),
+        process_json
+    )
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.post("/bulk-delete", response_model=BulkDeleteResponse)
+async def bulk_delete_diagnostics(
+    criteria: DiagnosticBulkDelete,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Supprimer des diagnostics en masse (par IDs ou par filtre)"""
+    if not criteria.dict(exclude_none=True):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Accès non autorisé à ce patient"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Au moins un critère de suppression est requis"
         )
-    
-    # Sauvegarder l'image
-    image_path = save_upload_file(image)
-    
-    # Prédire la fibrose (simulation)
-    resultat, probabilite = predict_fibrosis(image_path)
-    
-    # Créer le diagnostic
-    db_diagnostic = Diagnostic(
-        patient_id=patient_id,
-        medecin_id=current_user.id,
-        modele_utilise=modele_utilise,
-        resultat=resultat,
-        probabilite=probabilite,
-        image_url=image_path,
-        notes=notes
-    )
-    
-    db.add(db_diagnostic)
+
+    conditions = []
+    if criteria.ids is not None:
+        conditions.append(Diagnostic.id.in_(criteria.ids))
+    if criteria.patient_ids is not None:
+        conditions.append(Diagnostic.patient_id.in_(criteria.patient_ids))
+    if criteria.resultat is not None:
+        conditions.append(Diagnostic.resultat == criteria.resultat)
+    if criteria.created_before is not None:
+        conditions.append(Diagnostic.created_at < criteria.created_before)
+
+    if current_user.role.value == "medecin":
+        # Vérifier les permissions des IDs demandés en une seule requête
+        if criteria.ids is not None:
+            foreign = db.query(func.count(Diagnostic.id)).filter(
+                *conditions, Diagnostic.medecin_id != current_user.id
+            ).scalar()
+            if foreign:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Accès non autorisé"
+                )
+        conditions.append(Diagnostic.medecin_id == current_user.id)
+
+    targets = db.execute(
+        select(Diagnostic.id, Diagnostic.image_url, Diagnostic.medecin_id, Diagnostic.resultat).where(*conditions)
+    ).all()
+    if not targets:
+        return BulkDeleteResponse()
+
+    # Borne sur l'ID : les diagnostics créés entre-temps ne sont pas supprimés
+    max_id = max(row.id for row in targets)
+    deleted = db.execute(
+        delete(Diagnostic).where(*conditions, Diagnostic.id <= max_id),
+        execution_options={"synchronize_session": False}
+    ).rowcount
     db.commit()
-    db.refresh(db_diagnostic)
-    
-    return DiagnosticResponse.from_orm(db_diagnostic)
+
+    snapshot.discard(row.id for row in targets)
+    stats_broker.diagnostics_deleted((row.medecin_id, row.resultat) for row in targets)
+    background_tasks.add_task(remove_upload_files, [row.image_url for row in targets])
+
+    return BulkDeleteResponse(diagnostics_supprimes=deleted)
 
 @router.get("/", response_model=List[DiagnosticResponse])
 async def get_diagnostics(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     patient_id: Optional[int] = Query(None),
     resultat: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None, description="Champs à inclure, séparés par des virgules"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("medecin"))
 ):
     """Récupérer la liste des diagnostics"""
+    selected_fields = parse_fields(fields, DiagnosticResponse)
     query = db.query(Diagnostic)
     
     # Filtrer par médecin (sauf pour les admins)
@@ -109,12 +209,26 @@ async def get_diagnostics(
     if resultat is not None:
         query = query.filter(Diagnostic.resultat == resultat)
     
-    diagnostics = query.offset(skip).limit(limit).order_by(Diagnostic.date.desc()).all()
+    # Version calculée sur le contenu de la page : SQLite peut réattribuer
+    # l'ID le plus élevé après une suppression, l'ID seul ne versionne rien
+    diagnostics = query.order_by(Diagnostic.date.desc()).offset(skip).limit(limit).all()
+    etag = content_etag("diagnostics", DiagnosticResponse, diagnostics, fields)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    if use_fast_path(selected_fields):
+        fast_response = json_list_response(DiagnosticResponse, diagnostics, selected_fields)
+        set_etag(fast_response, etag)
+        return fast_response
+    
+    set_etag(response, etag)
     return [DiagnosticResponse.from_orm(diagnostic) for diagnostic in diagnostics]
 
 @router.get("/{diagnostic_id}", response_model=DiagnosticResponse)
 async def get_diagnostic(
     diagnostic_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("medecin"))
 ):
@@ -135,6 +249,12 @@ async def get_diagnostic(
             detail="Accès non autorisé"
         )
     
+    # Contenu inclus : un ID réattribué après suppression ne doit pas revalider l'ancien diagnostic
+    etag = content_etag("diagnostic", DiagnosticResponse, [diagnostic])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     return DiagnosticResponse.from_orm(diagnostic)
 
 @router.delete("/{diagnostic_id}")
@@ -164,7 +284,10 @@ async def delete_diagnostic(
     if diagnostic.image_url and os.path.exists(diagnostic.image_url):
         os.remove(diagnostic.image_url)
     
+    supprime = (diagnostic.medecin_id, diagnostic.resultat)
     db.delete(diagnostic)
     db.commit()
+    snapshot.discard([diagnostic_id])
+    stats_broker.diagnostics_deleted([supprime])
     
     return {"message": "Diagnostic supprimé avec succès"} 
\ No newline at end of file
@@ -1,13 +1,91 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from typing import Iterator, List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, UploadFile, File, Header, Response
+from pydantic import ValidationError
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, selectinload
 from app.database import get_db
-from app.models import User, Patient
-from app.schemas import PatientCreate, PatientUpdate, PatientResponse
+from app.models import User, Patient, Diagnostic
+from app.schemas import (
+    PatientCreate,
+    PatientUpdate,
+    PatientResponse,
+    PatientImportError,
+    PatientImportResponse,
+    PatientDossierResponse,
+    PatientBulkDelete,
+    BulkDeleteResponse
+)
 from app.auth import require_role
+from app.analytics import snapshot
+from app.events import stats_broker
+from app.routers.diagnostics import remove_upload_files
+from app.caching import content_etag, make_etag, etag_matches, set_etag, not_modified
+from app.serialization import parse_fields, use_fast_path, json_list_response
+import codecs
+import csv
+import io
+import json
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
+# Configuration de l'import en masse
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_READ_SIZE = 1 << 20
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+# Configuration des dossiers patients
+DOSSIER_MAX_PATIENTS = 100
+
+def is_utf8(upload_file: UploadFile) -> bool:
+    """Vérifie l'encodage du fichier avant l'import (aucune ligne insérée si invalide)"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while True:
+            data = upload_file.file.read(IMPORT_READ_SIZE)
+            decoder.decode(data, final=not data)
+            if not data:
+                return True
+    except UnicodeDecodeError:
+        return False
+    finally:
+        upload_file.file.seek(0)
+
+def iter_import_rows(upload_file: UploadFile) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+    """Lit un fichier CSV ou NDJSON ligne par ligne et retourne (ligne, données, erreur)"""
+    text = io.TextIOWrapper(upload_file.file, encoding="utf-8-sig", newline="")
+    filename = (upload_file.filename or "").lower()
+    content_type = upload_file.content_type or ""
+
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, None, f"JSON invalide: {e.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Chaque ligne doit être un objet JSON"
+                continue
+            yield line_number, row, None
+    else:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Les cellules vides du CSV correspondent aux champs optionnels absents
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}, None
+
+def validate_import_row(row: dict) -> tuple[Optional[dict], List[str]]:
+    """Valide une ligne d'import avec le schéma PatientCreate"""
+    try:
+        return PatientCreate(**row).dict(), []
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        ]
+
 @router.post("/", response_model=PatientResponse)
 async def create_patient(
     patient_data: PatientCreate,
@@ -26,15 +104,186 @@ async def create_patient(
     
     return PatientResponse.from_orm(db_patient)
 
+def load_dossiers(
+    db: Session,
+    patient_ids: List[int],
+    current_user: User,
+    diagnostics_limit: int
+) -> List[Patient]:
+    """Charge des patients avec leurs derniers diagnostics en deux requêtes"""
+    # Les N diagnostics les plus récents de chaque patient
+    ranked = select(
+        Diagnostic.id,
+        func.row_number().over(
+            partition_by=Diagnostic.patient_id,
+            order_by=(Diagnostic.date.desc(), Diagnostic.id.desc())
+        ).label("rang")
+    ).where(Diagnostic.patient_id.in_(patient_ids)).subquery()
+    recent_ids = select(ranked.c.id).where(ranked.c.rang <= diagnostics_limit)
+
+    query = db.query(Patient).options(
+        selectinload(Patient.diagnostics.and_(Diagnostic.id.in_(recent_ids)))
+    ).filter(Patient.id.in_(patient_ids))
+
+    # Vérifier les permissions directement en SQL
+    if current_user.role.value == "medecin":
+        query = query.filter(Patient.medecin_id == current_user.id)
+
+    return query.all()
+
+def delete_patients_where(
+    db: Session,
+    conditions: list,
+    background_tasks: BackgroundTasks
+) -> BulkDeleteResponse:
+    """Supprime les patients sélectionnés et leurs diagnostics en une transaction"""
+    patient_ids = select(Patient.id).where(*conditions).scalar_subquery()
+    diagnostics = db.execute(
+        select(Diagnostic.id, Diagnostic.image_url, Diagnostic.medecin_id, Diagnostic.resultat)
+        .where(Diagnostic.patient_id.in_(patient_ids))
+    ).all()
+
+    diagnostics_supprimes = db.execute(
+        delete(Diagnostic).where(Diagnostic.patient_id.in_(patient_ids)),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    patients_supprimes = db.execute(
+        delete(Patient).where(*conditions),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    db.commit()
+
+    if diagnostics:
+        snapshot.discard(row.id for row in diagnostics)
+        stats_broker.diagnostics_deleted((row.medecin_id, row.resultat) for row in diagnostics)
+        background_tasks.add_task(remove_upload_files, [row.image_url for row in diagnostics])
+
+    return BulkDeleteResponse(
+        patients_supprimes=patients_supprimes,
+        diagnostics_supprimes=diagnostics_supprimes
+    )
+
+@router.post("/import", response_model=PatientImportResponse)
+def import_patients(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Importer des patients en masse depuis un fichier CSV ou NDJSON"""
+    # Fonction synchrone : FastAPI l'exécute dans le threadpool pour ne pas
+    # bloquer la boucle d'événements pendant un import volumineux
+    total = 0
+    importes = 0
+    rejetes = 0
+    erreurs: List[PatientImportError] = []
+
+    def report(line_number: int, messages: List[str]):
+        nonlocal rejetes
+        rejetes += 1
+        if len(erreurs) < IMPORT_MAX_REPORTED_ERRORS:
+            erreurs.append(PatientImportError(ligne=line_number, erreurs=messages))
+
+    def flush(chunk: List[tuple[int, dict]]):
+        nonlocal importes
+        if not chunk:
+            return
+        try:
+            db.execute(insert(Patient), [values for _, values in chunk])
+            db.commit()
+            importes += len(chunk)
+            return
+        except SQLAlchemyError:
+            db.rollback()
+        # Lot refusé : réessayer ligne par ligne pour ne rejeter que les lignes fautives
+        for line_number, values in chunk:
+            try:
+                db.execute(insert(Patient), [values])
+                db.commit()
+                importes += 1
+            except SQLAlchemyError as e:
+                db.rollback()
+                report(line_number, [f"Erreur base de données: {e.__class__.__name__}"])
+
+    if not is_utf8(file):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Le fichier doit être encodé en UTF-8"
+        )
+
+    chunk: List[tuple[int, dict]] = []
+    for line_number, row, parse_error in iter_import_rows(file):
+        total += 1
+        if parse_error:
+            report(line_number, [parse_error])
+            continue
+
+        values, messages = validate_import_row(row)
+        if messages:
+            report(line_number, messages)
+            continue
+
+        values["medecin_id"] = current_user.id
+        chunk.append((line_number, values))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+    flush(chunk)
+
+    return PatientImportResponse(
+        total=total,
+        importes=importes,
+        rejetes=rejetes,
+        erreurs=erreurs
+    )
+
+@router.post("/bulk-delete", response_model=BulkDeleteResponse)
+async def bulk_delete_patients(
+    criteria: PatientBulkDelete,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Supprimer des patients en masse avec leurs diagnostics"""
+    if not criteria.dict(exclude_none=True):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Au moins un critère de suppression est requis"
+        )
+
+    conditions = []
+    if criteria.ids is not None:
+        conditions.append(Patient.id.in_(criteria.ids))
+    if criteria.created_before is not None:
+        conditions.append(Patient.created_at < criteria.created_before)
+
+    if current_user.role.value == "medecin":
+        # Vérifier les permissions des IDs demandés en une seule requête
+        if criteria.ids is not None:
+            foreign = db.query(func.count(Patient.id)).filter(
+                *conditions, Patient.medecin_id != current_user.id
+            ).scalar()
+            if foreign:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Accès non autorisé"
+                )
+        conditions.append(Patient.medecin_id == current_user.id)
+
+    return delete_patients_where(db, conditions, background_tasks)
+
 @router.get("/", response_model=List[PatientResponse])
 async def get_patients(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Champs à inclure, séparés par des virgules"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("medecin"))
 ):
     """Récupérer la liste des patients"""
+    selected_fields = parse_fields(fields, PatientResponse)
     query = db.query(Patient)
     
     # Filtrer par médecin (sauf pour les admins)
@@ -49,12 +298,77 @@ async def get_patients(
             (Patient.prenom.ilike(search_term))
         )
     
+    # Version calculée sur le contenu de la page : updated_at n'a qu'une précision
+    # à la seconde et ne suffit pas à distinguer deux modifications rapprochées
     patients = query.offset(skip).limit(limit).all()
+    etag = content_etag("patients", PatientResponse, patients, fields)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    if use_fast_path(selected_fields):
+        fast_response = json_list_response(PatientResponse, patients, selected_fields)
+        set_etag(fast_response, etag)
+        return fast_response
+    
+    set_etag(response, etag)
     return [PatientResponse.from_orm(patient) for patient in patients]
 
+@router.get("/dossiers", response_model=List[PatientDossierResponse])
+async def get_patient_dossiers(
+    ids: str = Query(..., description="IDs des patients séparés par des virgules"),
+    diagnostics_limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Récupérer plusieurs dossiers patients (patients non autorisés ignorés)"""
+    try:
+        patient_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Liste d'IDs invalide"
+        )
+
+    if len(patient_ids) > DOSSIER_MAX_PATIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {DOSSIER_MAX_PATIENTS} patients par requête"
+        )
+
+    patients = {
+        patient.id: patient
+        for patient in load_dossiers(db, patient_ids, current_user, diagnostics_limit)
+    }
+    return [
+        PatientDossierResponse.from_orm(patients[patient_id])
+        for patient_id in patient_ids if patient_id in patients
+    ]
+
+@router.get("/{patient_id}/dossier", response_model=PatientDossierResponse)
+async def get_patient_dossier(
+    patient_id: int,
+    diagnostics_limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Récupérer un patient et son historique de diagnostics"""
+    patients = load_dossiers(db, [patient_id], current_user, diagnostics_limit)
+
+    if not patients:
+        # Distinguer patient inexistant et accès refusé (chemin d'erreur uniquement)
+        exists = db.query(Patient.id).filter(Patient.id == patient_id).first()
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN if exists else status.HTTP_404_NOT_FOUND,
+            detail="Accès non autorisé" if exists else "Patient non trouvé"
+        )
+
+    return PatientDossierResponse.from_orm(patients[0])
+
 @router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(
     patient_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("medecin"))
 ):
@@ -75,6 +389,16 @@ async def get_patient(
             detail="Accès non autorisé"
         )
     
+    # updated_at n'a qu'une précision à la seconde : les champs modifiables
+    # sont inclus pour distinguer deux mises à jour rapprochées
+    etag = make_etag(
+        "patient", patient.id, patient.updated_at or patient.created_at,
+        *(getattr(patient, field) for field in PatientUpdate.__fields__)
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     return PatientResponse.from_orm(patient)
 
 @router.put("/{patient_id}", response_model=PatientResponse)
@@ -114,6 +438,7 @@ async def update_patient(
 @router.delete("/{patient_id}")
 async def delete_patient(
     patient_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("medecin"))
 ):
@@ -134,7 +459,7 @@ async def delete_patient(
             detail="Accès non autorisé"
         )
     
-    db.delete(patient)
-    db.commit()
+    # Supprimer aussi les diagnostics du patient et leurs images
+    delete_patients_where(db, [Patient.id == patient_id], background_tasks)
     
     return {"message": "Patient supprimé avec succès"} 
\ No newline at end of file
@@ -1,45 +1,55 @@
-from typing import List
-from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models import User, Patient, Diagnostic
 from app.schemas import StatisticsResponse
-from app.auth import require_role
+from app.auth import decode_token_subject, require_role
+from app.analytics import snapshot
+from app.events import KEEPALIVE, SSE_KEEPALIVE, SSE_RESYNC_INTERVAL, format_event, stats_broker
 from datetime import datetime, timedelta
+import asyncio
+import time
 
 router = APIRouter(prefix="/stats", tags=["statistiques"])
 
-@router.get("/", response_model=StatisticsResponse)
-async def get_statistics(
-    start_date: str = Query(None, description="Date de début (YYYY-MM-DD)"),
-    end_date: str = Query(None, description="Date de fin (YYYY-MM-DD)"),
-    medecin_id: int = Query(None, description="ID du médecin pour filtrer"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("medecin"))
-):
-    """Récupérer les statistiques globales"""
+def parse_date(value: str) -> datetime:
+    """Date au format YYYY-MM-DD, 400 si le format est invalide"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format de date invalide (attendu : YYYY-MM-DD)"
+        )
+
+def compute_statistics(
+    db: Session,
+    medecin_id: Optional[int] = None,
+    start_date: str = None,
+    end_date: str = None
+) -> StatisticsResponse:
+    """Statistiques globales, limitées à un médecin si medecin_id est fourni"""
     
     # Construire les filtres de base
     patient_query = db.query(Patient)
     diagnostic_query = db.query(Diagnostic)
     
-    # Filtrer par médecin si spécifié ou si l'utilisateur est un médecin
     if medecin_id:
         patient_query = patient_query.filter(Patient.medecin_id == medecin_id)
         diagnostic_query = diagnostic_query.filter(Diagnostic.medecin_id == medecin_id)
-    elif current_user.role.value == "medecin":
-        patient_query = patient_query.filter(Patient.medecin_id == current_user.id)
-        diagnostic_query = diagnostic_query.filter(Diagnostic.medecin_id == current_user.id)
     
     # Filtrer par dates si spécifiées
     if start_date:
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+        start_dt = parse_date(start_date)
         patient_query = patient_query.filter(Patient.created_at >= start_dt)
         diagnostic_query = diagnostic_query.filter(Diagnostic.created_at >= start_dt)
     
     if end_date:
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+        end_dt = parse_date(end_date) + timedelta(days=1)
         patient_query = patient_query.filter(Patient.created_at < end_dt)
         diagnostic_query = diagnostic_query.filter(Diagnostic.created_at < end_dt)
     
@@ -83,6 +93,112 @@ async def get_statistics(
         diagnostics_par_mois=diagnostics_par_mois
     )
 
+@router.get("/", response_model=StatisticsResponse)
+async def get_statistics(
+    start_date: str = Query(None, description="Date de début (YYYY-MM-DD)"),
+    end_date: str = Query(None, description="Date de fin (YYYY-MM-DD)"),
+    medecin_id: int = Query(None, description="ID du médecin pour filtrer"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Récupérer les statistiques globales"""
+    # Filtrer par médecin si spécifié ou si l'utilisateur est un médecin
+    if not medecin_id and current_user.role.value == "medecin":
+        medecin_id = current_user.id
+    return compute_statistics(db, medecin_id, start_date, end_date)
+
+def _stream_user(request: Request, token: Optional[str]) -> tuple[str, Optional[int]]:
+    """Jeton du flux (en-tête Authorization ou paramètre token) et périmètre de l'utilisateur"""
+    scheme, _, header_token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and header_token:
+        token = header_token
+    user_id = decode_token_subject(token) if token else None
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Impossible de valider les informations d'identification",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Impossible de valider les informations d'identification",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        # Mêmes droits que GET /stats/ : un médecin reçoit sa patientèle, un super-administrateur tout
+        if user.role.value not in ("medecin", "super-admin"):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Permissions insuffisantes"
+            )
+        return token, user.id if user.role.value == "medecin" else None
+    finally:
+        db.close()
+
+def _snapshot_event(medecin_id: Optional[int]) -> bytes:
+    """Instantané des statistiques du périmètre, avec le numéro du dernier événement inclus"""
+    db = SessionLocal()
+    try:
+        stats = compute_statistics(db, medecin_id)
+    finally:
+        db.close()
+    # Numéro lu après le calcul : un événement publié pendant le calcul est déjà compté
+    # dans l'instantané et ne doit pas être réappliqué par le client
+    sequence = stats_broker.sequence
+    stats_broker.resyncs += 1
+    return format_event("snapshot", {**stats.model_dump(), "sequence": sequence}, sequence)
+
+@router.get("/stream")
+async def stream_statistics(
+    request: Request,
+    token: Optional[str] = Query(None, description="Jeton d'accès (EventSource ne peut pas envoyer d'en-tête)")
+):
+    """Flux Server-Sent Events des statistiques : instantané puis deltas"""
+    # Pas de session liée à la requête : elle resterait ouverte pendant tout le flux
+    token, medecin_id = await run_in_threadpool(_stream_user, request, token)
+    subscriber = stats_broker.subscribe(medecin_id)
+
+    async def events():
+        try:
+            # À la connexion comme à chaque reconnexion (Last-Event-ID), repartir d'un instantané
+            yield await run_in_threadpool(_snapshot_event, medecin_id)
+            next_resync = time.monotonic() + SSE_RESYNC_INTERVAL
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    payload = KEEPALIVE
+                # Jeton expiré : le client se reconnecte avec un nouveau jeton
+                if decode_token_subject(token) is None:
+                    return
+                resync = SSE_RESYNC_INTERVAL > 0 and time.monotonic() >= next_resync
+                if subscriber.lagging:
+                    # Événements perdus : l'instantané les remplace
+                    subscriber.lagging = False
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    payload, resync = b"", True
+                if payload:
+                    yield payload
+                if resync:
+                    yield await run_in_threadpool(_snapshot_event, medecin_id)
+                    next_resync = time.monotonic() + SSE_RESYNC_INTERVAL
+        finally:
+            stats_broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Désactiver la mise en tampon des proxys (nginx)
+            "X-Accel-Buffering": "no",
+        }
+    )
+
 @router.get("/medecins")
 async def get_medecin_stats(
     db: Session = Depends(get_db),
@@ -137,4 +253,58 @@ async def get_model_performance(
             "diagnostics_haute_confiance": high_conf
         }
         for modele, total, avg_prob, high_conf in performance_data
-    ] 
\ No newline at end of file
+    ] 
+
+def _analytics_filters(
+    current_user: User,
+    start_date: str = None,
+    end_date: str = None
+) -> dict:
+    """Construit les filtres de l'instantané selon l'utilisateur et la période"""
+    filters = {}
+    if current_user.role.value == "medecin":
+        filters["medecin_id"] = current_user.id
+    if start_date:
+        filters["start"] = parse_date(start_date)
+    if end_date:
+        filters["end"] = parse_date(end_date) + timedelta(days=1)
+    return filters
+
+@router.get("/performance/distribution")
+async def get_probability_distribution(
+    bins: int = Query(20, ge=1, le=100),
+    start_date: str = Query(None, description="Date de début (YYYY-MM-DD)"),
+    end_date: str = Query(None, description="Date de fin (YYYY-MM-DD)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Histogramme des probabilités par modèle"""
+    filters = _analytics_filters(current_user, start_date, end_date)
+    # Rafraîchissement synchrone (requêtes SQL) : hors de la boucle d'événements
+    await run_in_threadpool(snapshot.refresh, db)
+    return snapshot.probability_histogram(bins=bins, **filters)
+
+@router.get("/performance/stades")
+async def get_stage_matrix(
+    start_date: str = Query(None, description="Date de début (YYYY-MM-DD)"),
+    end_date: str = Query(None, description="Date de fin (YYYY-MM-DD)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Répartition des stades de fibrose par modèle"""
+    filters = _analytics_filters(current_user, start_date, end_date)
+    await run_in_threadpool(snapshot.refresh, db)
+    return snapshot.stage_matrix(**filters)
+
+@router.get("/performance/calibration")
+async def get_model_calibration(
+    bins: int = Query(10, ge=1, le=50),
+    start_date: str = Query(None, description="Date de début (YYYY-MM-DD)"),
+    end_date: str = Query(None, description="Date de fin (YYYY-MM-DD)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("medecin"))
+):
+    """Intervalles de calibration des probabilités par modèle"""
+    filters = _analytics_filters(current_user, start_date, end_date)
+    await run_in_threadpool(snapshot.refresh, db)
+    return snapshot.calibration(bins=bins, **filters)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, validator
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import datetime
 from app.models import UserRole, Sexe
 
@@ -63,6 +63,24 @@ class PatientResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class PatientImportError(BaseModel):
+    ligne: int
+    erreurs: List[str]
+
+class PatientImportResponse(BaseModel):
+    total: int
+    importes: int
+    rejetes: int
+    erreurs: List[PatientImportError]
+
+class PatientBulkDelete(BaseModel):
+    ids: Optional[List[int]] = None
+    created_before: Optional[datetime] = None
+
+class BulkDeleteResponse(BaseModel):
+    patients_supprimes: int = 0
+    diagnostics_supprimes: int = 0
+
 # Schémas pour les diagnostics
 class DiagnosticCreate(BaseModel):
     patient_id: int
@@ -99,12 +117,21 @@ class DiagnosticResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DiagnosticBulkDelete(BaseModel):
+    ids: Optional[List[int]] = None
+    patient_ids: Optional[List[int]] = None
+    resultat: Optional[int] = None
+    created_before: Optional[datetime] = None
+
+class PatientDossierResponse(PatientResponse):
+    diagnostics: List[DiagnosticResponse]
+
 # Schémas pour les statistiques
 class StatisticsResponse(BaseModel):
     total_patients: int
     total_diagnostics: int
     repartition_fibrose: dict[int, int]
-    diagnostics_par_mois: List[dict[str, any]]
+    diagnostics_par_mois: List[dict[str, Any]]
 
 # Schémas pour l'audit
 class AuditLogResponse(BaseModel):
@@ -118,4 +145,50 @@ class AuditLogResponse(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class AuditLogPage(BaseModel):
+    items: List[AuditLogResponse]
+    next_cursor: Optional[str] = None
+
+# Schémas pour les modèles d'inférence
+class ModelLoadRequest(BaseModel):
+    backend: str = "onnx"
+    path: Optional[str] = None
+    variant: str = "fp32"
+    input_size: int = 224
+    warmup: int = 10
+
+# Schémas pour les requêtes groupées
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None
+    methode: str = "GET"
+    chemin: str
+    params: Optional[dict[str, Any]] = None
+    en_tetes: Optional[dict[str, str]] = None
+    corps: Optional[Any] = None
+
+    @validator('methode')
+    def validate_methode(cls, v):
+        v = v.upper()
+        if v not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise ValueError('Méthode non supportée')
+        return v
+
+    @validator('chemin')
+    def validate_chemin(cls, v):
+        if not v.startswith('/api/'):
+            raise ValueError('Le chemin doit commencer par /api/')
+        return v
+
+class BatchRequest(BaseModel):
+    requetes: List[BatchSubRequest]
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    statut: int
+    en_tetes: dict[str, str]
+    corps: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    reponses: List[BatchSubResponse]
@@ -0,0 +1,68 @@
+"""
+Sérialisation rapide des listes de résultats
+Convertit les objets ORM en une seule passe directement en JSON (bytes)
+avec pydantic-core, au lieu de from_orm + response_model + encodeur json.
+"""
+
+import os
+from functools import lru_cache
+from typing import Iterable, List, Optional, Type
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, TypeAdapter
+
+load_dotenv()
+
+# Active le chemin rapide pour toutes les listes (sinon uniquement avec ?fields=)
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() == "true"
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[set]:
+    """Valide le paramètre ?fields= (champs séparés par des virgules)"""
+    if not fields:
+        return None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Champs inconnus: {', '.join(sorted(unknown))}"
+        )
+    return selected
+
+
+def use_fast_path(fields: Optional[set]) -> bool:
+    """Le chemin rapide est activé globalement ou par une projection de champs"""
+    return FAST_JSON or fields is not None
+
+
+def dump_list(
+    schema: Type[BaseModel],
+    rows: Iterable,
+    fields: Optional[set] = None
+) -> bytes:
+    """Sérialise des objets ORM en JSON en une seule passe"""
+    adapter = _list_adapter(schema)
+    items = adapter.validate_python(list(rows), from_attributes=True)
+    include = {"__all__": fields} if fields else None
+    return adapter.dump_json(items, include=include)
+
+
+def json_list_response(
+    schema: Type[BaseModel],
+    rows: Iterable,
+    fields: Optional[set] = None,
+    headers: Optional[dict] = None
+) -> Response:
+    """Réponse JSON construite directement à partir des objets ORM"""
+    return Response(
+        content=dump_list(schema, rows, fields),
+        media_type="application/json",
+        headers=headers
+    )
@@ -0,0 +1,117 @@
+"""
+Serveur de production
+Gunicorn (gestion des processus) + workers Uvicorn (uvloop / httptools).
+L'application est importée dans le processus maître avant le fork, pour que
+les workers partagent cette mémoire en copie sur écriture. Les connexions à
+la base et les sessions d'inférence ne survivent pas à un fork : chaque
+worker les recrée (post_fork).
+"""
+
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration de production (surchargée par les variables d'environnement)
+WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# Recyclage des workers après N requêtes (avec gigue pour éviter les redémarrages simultanés)
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "10000"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", str(MAX_REQUESTS // 10)))
+# Supérieur au délai d'inactivité des répartiteurs de charge courants (60 s)
+KEEPALIVE = int(os.getenv("KEEPALIVE", "65"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "120"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+try:
+    from uvicorn.workers import UvicornWorker
+
+    class ProductionWorker(UvicornWorker):
+        """Worker Uvicorn avec boucle uvloop et parseur HTTP httptools"""
+
+        CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+except ImportError:  # gunicorn absent (Windows)
+    ProductionWorker = None
+
+
+def worker_count() -> int:
+    """Nombre de workers du serveur en cours (1 hors de run_production)"""
+    return int(os.getenv("APP_WORKERS", "1"))
+
+
+def preload():
+    """Charge l'application et prépare les fichiers des modèles avant le fork des workers"""
+    from app.main import app
+    from app.inference import model_registry
+
+    model_registry.prepare()
+    return app
+
+
+def post_fork(server, worker):
+    """Dans chaque worker : pool de connexions et sessions d'inférence propres au processus"""
+    from app.database import engine
+    from app.inference import model_registry
+
+    # Connexions héritées du maître : abandonnées sans être fermées (le maître les possède)
+    engine.dispose(close=False)
+    model_registry.load_all()
+
+
+def run_production(host: str, port: int):
+    """Démarre le serveur multi-processus"""
+    # Hérité par les workers : état par processus (modèles, métriques) à signaler
+    os.environ["APP_WORKERS"] = str(WORKERS)
+    if WORKERS > 1:
+        # Métriques exportées par chaque worker et agrégées par /metrics
+        from app.metrics import clear_exports
+
+        directory = os.getenv("METRICS_DIR") or tempfile.mkdtemp(prefix="fibrose-metrics-")
+        os.makedirs(directory, exist_ok=True)
+        clear_exports(directory)
+        os.environ["METRICS_DIR"] = directory
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # Pas de gunicorn (Windows) : plusieurs workers uvicorn, sans préchargement ni
+        # recyclage (uvicorn ne relance pas un worker arrêté par limit_max_requests),
+        # uvloop / httptools seulement s'ils sont disponibles
+        import uvicorn
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=port,
+            workers=WORKERS,
+            loop="auto",
+            http="auto",
+            backlog=BACKLOG,
+            timeout_keep_alive=KEEPALIVE,
+            log_level="info"
+        )
+        return
+
+    class ProductionApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": WORKERS,
+                "worker_class": "app.server.ProductionWorker",
+                "preload_app": True,
+                "post_fork": post_fork,
+                "max_requests": MAX_REQUESTS,
+                "max_requests_jitter": MAX_REQUESTS_JITTER,
+                "keepalive": KEEPALIVE,
+                "backlog": BACKLOG,
+                "timeout": TIMEOUT,
+                "graceful_timeout": GRACEFUL_TIMEOUT,
+                "loglevel": "info",
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return preload()
+
+    ProductionApplication().run()
@@ -0,0 +1,148 @@
+"""
+Mode SQLite (déploiements mono-serveur)
+Connexions sqlite3 dont les écritures passent par un verrou d'écriture
+unique du processus : une transaction d'écriture attend son tour au lieu
+d'échouer avec « database is locked ». Le verrou est pris avant la première
+instruction d'écriture d'une transaction et rendu après commit / rollback.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from app.metrics import registry
+
+load_dotenv()
+
+# Réglages SQLite (surchargés par les variables d'environnement)
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# Cache de pages par connexion (Kio) et taille de la projection mémoire (octets)
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "32"))
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+
+writer_wait = registry.histogram(
+    "db_sqlite_writer_wait_seconds",
+    "Attente du verrou d'écriture SQLite"
+)
+
+
+class WriterLock:
+    """Verrou d'écriture partagé par toutes les connexions du processus"""
+
+    def __init__(self, timeout: float = SQLITE_BUSY_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._lock.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("database is locked (délai du verrou d'écriture dépassé)")
+        writer_wait.observe(time.perf_counter() - start)
+
+    def release(self):
+        self._lock.release()
+
+
+writer_lock = WriterLock()
+
+
+def _is_write(sql: str) -> bool:
+    return sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+
+
+class WriterCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        self.connection.before_statement(sql)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.after_statement()
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.before_statement(sql)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.after_statement()
+
+
+class WriterConnection(sqlite3.Connection):
+    """Connexion sqlite3 qui prend le verrou d'écriture pour ses transactions d'écriture"""
+
+    holds_writer = False
+
+    def cursor(self, factory=WriterCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def before_statement(self, sql: str):
+        if not self.holds_writer and _is_write(sql):
+            writer_lock.acquire()
+            self.holds_writer = True
+
+    def after_statement(self):
+        # Instruction exécutée hors transaction (validée immédiatement) : rendre le verrou
+        if self.holds_writer and not self.in_transaction:
+            self.release_writer()
+
+    def release_writer(self):
+        if self.holds_writer:
+            self.holds_writer = False
+            writer_lock.release()
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self.release_writer()
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self.release_writer()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.release_writer()
+
+
+def connect_args() -> dict:
+    """Arguments de connexion sqlite3 pour create_engine"""
+    return {
+        "factory": WriterConnection,
+        # Les connexions passent d'un thread à l'autre via le pool (une seule à la fois)
+        "check_same_thread": False,
+        "timeout": SQLITE_BUSY_TIMEOUT,
+    }
+
+
+def apply_pragmas(dbapi_connection, connection_record=None):
+    """Réglages appliqués à chaque nouvelle connexion"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={-SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        # Contraintes de clés étrangères appliquées comme sous MySQL
+        cursor.execute("PRAGMA foreign_keys=ON")
+    finally:
+        cursor.close()
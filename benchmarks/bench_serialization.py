@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de la sérialisation des listes patients / diagnostics
+Compare le chemin standard (from_orm + response_model + encodeur json)
+au chemin rapide (app.serialization) sur des pages de 1000 objets ORM.
+
+Usage: python benchmarks/bench_serialization.py [--rows 1000] [--repeat 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models import Patient, Diagnostic, Sexe
+from app.schemas import PatientResponse, DiagnosticResponse
+from app.serialization import dump_list
+
+
+def build_patients(count: int) -> List[Patient]:
+    now = datetime(2024, 1, 1)
+    return [
+        Patient(
+            id=i,
+            nom=f"Nom{i}",
+            prenom=f"Prenom{i}",
+            date_naissance=now - timedelta(days=365 * 40 + i),
+            sexe=Sexe.M if i % 2 else Sexe.F,
+            telephone="01 23 45 67 89",
+            email=f"patient{i}@email.fr",
+            adresse=f"{i} Rue de la Santé, 75014 Paris",
+            medecin_id=1,
+            created_at=now
+        )
+        for i in range(count)
+    ]
+
+
+def build_diagnostics(count: int) -> List[Diagnostic]:
+    now = datetime(2024, 1, 1)
+    return [
+        Diagnostic(
+            id=i,
+            patient_id=i,
+            medecin_id=1,
+            date=now,
+            modele_utilise="Vision Transformer v2.1",
+            resultat=i % 5,
+            probabilite=0.8,
+            image_url=f"uploads/{i}.png",
+            notes="Fibrose légère détectée",
+            created_at=now
+        )
+        for i in range(count)
+    ]
+
+
+def standard_path(field, schema, rows) -> bytes:
+    """Reproduit le traitement FastAPI d'un handler avec response_model"""
+    content = [schema.from_orm(row) for row in rows]
+    serialized = asyncio.run(serialize_response(field=field, response_content=content))
+    return json.dumps(serialized, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def run(name: str, func, repeat: int, rows: int):
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"{name:<45} {best * 1000:8.2f} ms  ({rows / best:,.0f} lignes/s)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for label, schema, rows, fields in [
+        ("patients", PatientResponse, build_patients(args.rows), {"id", "nom", "prenom"}),
+        ("diagnostics", DiagnosticResponse, build_diagnostics(args.rows), {"id", "resultat", "probabilite"}),
+    ]:
+        print(f"\n== {label} ({args.rows} lignes) ==")
+        field = create_response_field(name="response", type_=List[schema])
+        standard = run("standard (from_orm + response_model)", lambda: standard_path(field, schema, rows), args.repeat, args.rows)
+        fast = run("rapide (TypeAdapter.dump_json)", lambda: dump_list(schema, rows), args.repeat, args.rows)
+        run("rapide + ?fields=", lambda: dump_list(schema, rows, fields), args.repeat, args.rows)
+        print(f"gain: x{standard / fast:.1f}")
+
+
+if __name__ == "__main__":
+    main()
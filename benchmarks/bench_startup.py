@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark du démarrage
+Mesure, dans des processus neufs, le temps d'import de app.main et le délai
+entre le lancement d'un worker uvicorn et la première réponse de /health.
+Détaille aussi les modules les plus coûteux à l'import (python -X importtime).
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--top 15]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(timeout: float = 30.0) -> float:
+    """Délai entre le lancement du processus et la première réponse 200 de /health"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("Le serveur n'a pas répondu à temps")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def top_imports(top: int) -> list:
+    """Modules au coût d'import propre le plus élevé"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def summary(label: str, samples: list):
+    print(
+        f"{label:<22} médiane {statistics.median(samples) * 1000:8.1f} ms   "
+        f"min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    summary("import app.main", [measure_import() for _ in range(args.repeat)])
+    summary("premier /health", [measure_ready() for _ in range(args.repeat)])
+
+    if args.top:
+        print(f"\nModules les plus coûteux (temps propre, {args.top} premiers):")
+        for self_us, cumulative_us, name in top_imports(args.top):
+            print(f"  {self_us / 1000:8.1f} ms  (cumulé {cumulative_us / 1000:8.1f} ms)  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Test de charge reproductible de l'API
+Démarre app.main:app (uvicorn) sur une base SQLite jetable ou une base
+fournie, la remplit avec un volume réaliste, puis envoie une charge mixte
+(connexion, recherche patients, pages de listes, upload de diagnostic avec
+le modèle de simulation, statistiques) depuis des clients httpx asynchrones.
+Rapporte p50/p95/p99 et débit par endpoint et compare à une référence.
+
+Usage:
+    python benchmarks/load_test.py --duration 30 --concurrency 32
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import httpx
+
+PASSWORD = "password123"
+# Domaine des adresses des médecins générés (scripts/init_db.py generate_data)
+EMAIL_DOMAIN = "fibrose.test"
+NOMS = ["Dupont", "Martin", "Bernard", "Leroy", "Moreau", "Laurent", "Simon", "Michel", "Durand", "David"]
+# Image minimale envoyée au modèle de simulation
+IMAGE = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048
+
+# Scénario : (nom, poids)
+WORKLOAD = [
+    ("patients_recherche", 20),
+    ("patients_page", 25),
+    ("diagnostics_page", 20),
+    ("patient_detail", 15),
+    ("diagnostic_upload", 5),
+    ("stats", 10),
+    ("login", 5),
+]
+
+
+def seed(database_url: str, doctors: int, patients_per_doctor: int, diagnostics_per_patient: float, rng_seed: int) -> dict:
+    """Crée le schéma et génère les données (médecins medecin<id>@fibrose.test)"""
+    os.environ["DATABASE_URL"] = database_url
+    from app.database import engine, run_migrations
+    from scripts.init_db import generate_data
+
+    engine.echo = False
+    run_migrations()
+    return generate_data(
+        doctors, patients_per_doctor, diagnostics_per_patient,
+        seed=rng_seed, password=PASSWORD, email_domain=EMAIL_DOMAIN
+    )
+
+
+def load_patient_ids(database_url: str, doctors: int) -> Dict[str, List[int]]:
+    """Patients des médecins générés (domaine EMAIL_DOMAIN, au plus `doctors`), lus en base"""
+    os.environ["DATABASE_URL"] = database_url
+    from sqlalchemy import func
+    from app.database import SessionLocal, engine
+    from app.models import Patient, User, UserRole
+
+    engine.echo = False
+    db = SessionLocal()
+    try:
+        # Les ids (et donc les adresses medecin<id>@...) suivent les utilisateurs déjà présents
+        medecins = db.query(User.id, User.email).join(
+            Patient, Patient.medecin_id == User.id
+        ).filter(
+            User.role == UserRole.MEDECIN,
+            User.email.like(f"%@{EMAIL_DOMAIN}")
+        ).group_by(User.id, User.email).having(func.count(Patient.id) > 0).order_by(User.id).limit(doctors).all()
+        emails = {medecin_id: email for medecin_id, email in medecins}
+        rows = db.query(Patient.medecin_id, Patient.id).filter(
+            Patient.medecin_id.in_(emails)
+        ).order_by(Patient.id).all() if emails else []
+    finally:
+        db.close()
+    # Connexions du processus de test fermées avant le démarrage du serveur
+    engine.dispose()
+
+    patient_ids: Dict[str, List[int]] = {}
+    for medecin_id, patient_id in rows:
+        patient_ids.setdefault(emails[medecin_id], []).append(patient_id)
+    if not patient_ids:
+        raise SystemExit(
+            f"Aucun médecin @{EMAIL_DOMAIN} avec des patients : "
+            "peuplez la base avec scripts/init_db.py --doctors ..."
+        )
+    return patient_ids
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, port: int, workers: int, workdir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "PYTHONPATH": ROOT,
+        # La journalisation SQL fausserait les mesures
+        "SQL_ECHO": "false",
+        # Le test mesure l'API, pas les limites d'admission de l'inférence
+        "INFERENCE_MAX_PER_USER": "1000",
+        "INFERENCE_MAX_QUEUE": "1000",
+    }
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=log
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError("Le serveur n'a pas démarré à temps")
+
+
+class Recorder:
+    """Latences et erreurs par opération"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name: str, elapsed: float, ok: bool):
+        self.latencies[name].append(elapsed)
+        if not ok:
+            self.errors[name] += 1
+
+
+async def login(client: httpx.AsyncClient, email: str, recorder: Recorder) -> Optional[dict]:
+    """En-têtes d'authentification, None si la connexion échoue (erreur comptée)"""
+    start = time.perf_counter()
+    try:
+        response = await client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+    except httpx.HTTPError:
+        recorder.record("login", time.perf_counter() - start, False)
+        return None
+    ok = response.status_code == 200
+    recorder.record("login", time.perf_counter() - start, ok)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"} if ok else None
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    user_index: int,
+    patient_ids: Dict[str, List[int]],
+    deadline: float,
+    recorder: Recorder,
+    rng: random.Random
+):
+    emails = sorted(patient_ids)
+    email = emails[user_index % len(emails)]
+    patients = patient_ids[email]
+    names, weights = zip(*WORKLOAD)
+    headers = None
+
+    while time.monotonic() < deadline:
+        if headers is None:
+            # Connexion refusée ou en erreur : nouvel essai sans interrompre le test
+            headers = await login(client, email, recorder)
+            if headers is None:
+                await asyncio.sleep(0.5)
+            continue
+        operation = rng.choices(names, weights)[0]
+        patient_id = rng.choice(patients)
+        start = time.perf_counter()
+        if operation == "login":
+            headers = await login(client, email, recorder) or headers
+            continue
+        try:
+            response = await request(client, operation, patient_id, len(patients), headers, rng)
+        except httpx.HTTPError:
+            recorder.record(operation, time.perf_counter() - start, False)
+            continue
+        recorder.record(operation, time.perf_counter() - start, response.status_code < 400)
+
+
+async def request(
+    client: httpx.AsyncClient,
+    operation: str,
+    patient_id: int,
+    nb_patients: int,
+    headers: dict,
+    rng: random.Random
+) -> httpx.Response:
+    if operation == "patients_recherche":
+        return await client.get("/api/patients/", params={"search": rng.choice(NOMS), "limit": 20}, headers=headers)
+    if operation == "patients_page":
+        return await client.get("/api/patients/", params={"skip": rng.randrange(0, max(nb_patients - 50, 1)), "limit": 50}, headers=headers)
+    if operation == "diagnostics_page":
+        return await client.get("/api/diagnostics/", params={"limit": 50}, headers=headers)
+    if operation == "patient_detail":
+        return await client.get(f"/api/patients/{patient_id}/dossier", headers=headers)
+    if operation == "diagnostic_upload":
+        return await client.post(
+            "/api/diagnostics/",
+            params={"patient_id": patient_id},
+            files={"image": ("coupe.png", IMAGE, "image/png")},
+            headers=headers
+        )
+    return await client.get("/api/stats/", headers=headers)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    results = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        results[name] = {
+            "requetes": len(values),
+            "erreurs": recorder.errors[name],
+            "debit_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+    total = sum(len(v) for v in recorder.latencies.values())
+    results["total"] = {
+        "requetes": total,
+        "erreurs": sum(recorder.errors.values()),
+        "debit_rps": round(total / elapsed, 2),
+    }
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Régressions : p95 plus lent ou débit plus faible que la référence au-delà de la tolérance"""
+    regressions = []
+    for name, reference in baseline.get("resultats", {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if "p95_ms" in reference and current["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']} ms > {reference['p95_ms']} ms")
+        if current["debit_rps"] < reference["debit_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: débit {current['debit_rps']} < {reference['debit_rps']} req/s")
+    return regressions
+
+
+def print_report(results: dict):
+    print(f"\n{'endpoint':<22}{'req':>8}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in results.items():
+        if name == "total":
+            continue
+        print(
+            f"{name:<22}{row['requetes']:>8}{row['erreurs']:>6}{row['debit_rps']:>10}"
+            f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+        )
+    total = results["total"]
+    print(f"{'total':<22}{total['requetes']:>8}{total['erreurs']:>6}{total['debit_rps']:>10}")
+
+
+async def run_load(args, base_url: str, patient_ids: Dict[str, List[int]]) -> dict:
+    await wait_ready(base_url)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Préchauffage (chargement de l'instantané d'analyse, caches)
+        warmup_deadline = time.monotonic() + args.warmup
+        await asyncio.gather(*(
+            virtual_user(client, i, patient_ids, warmup_deadline, Recorder(), random.Random(i))
+            for i in range(min(args.concurrency, len(patient_ids)))
+        ))
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, i, patient_ids, deadline, recorder, random.Random(args.seed + i))
+            for i in range(args.concurrency)
+        ))
+        elapsed = time.monotonic() - start
+    return summarize(recorder, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Base existante (par défaut : SQLite jetable)")
+    parser.add_argument("--no-seed", action="store_true", help="Ne pas remplir la base (déjà peuplée)")
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=500, help="Patients par médecin")
+    parser.add_argument("--diagnostics", type=float, default=4, help="Diagnostics par patient (moyenne)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clients simultanés")
+    parser.add_argument("--duration", type=float, default=30, help="Durée de la mesure (secondes)")
+    parser.add_argument("--warmup", type=float, default=3, help="Durée du préchauffage (secondes)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers uvicorn")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Écrit les résultats en JSON")
+    parser.add_argument("--baseline", help="Référence JSON à comparer")
+    parser.add_argument("--save-baseline", help="Enregistre les résultats comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Écart toléré avant régression (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="fibrose-bench-") as workdir:
+        database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        if not args.no_seed:
+            seed(database_url, args.doctors, args.patients, args.diagnostics, args.seed)
+        patient_ids = load_patient_ids(database_url, args.doctors)
+
+        port = free_port()
+        server = start_server(database_url, port, args.workers, workdir)
+        try:
+            results = asyncio.run(run_load(args, f"http://127.0.0.1:{port}", patient_ids))
+        except Exception:
+            # Afficher la fin du journal du serveur pour diagnostiquer l'échec
+            with open(os.path.join(workdir, "server.log"), errors="replace") as f:
+                print("".join(f.readlines()[-30:]), file=sys.stderr)
+            raise
+        finally:
+            server.terminate()
+            server.wait()
+
+    print_report(results)
+    report = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "parametres": {
+            key: getattr(args, key)
+            for key in ("doctors", "patients", "diagnostics", "concurrency", "duration", "workers", "seed")
+        },
+        "resultats": results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Régressions par rapport à la référence :")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n✅ Aucune régression par rapport à la référence")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Environnement Alembic
+Réutilise le moteur de l'application : l'URL vient de DATABASE_URL.
+"""
+
+import re
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import engine
+from app.models import Base
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Tables d'archives d'audit (audit_logs_YYYYMM) gérées par app/audit.py
+ARCHIVE_TABLE = re.compile(r"^audit_logs_\d{6}$")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Exclut les archives d'audit de l'autogénération"""
+    if type_ == "table" and reflected and ARCHIVE_TABLE.match(name):
+        return False
+    return True
+
+
+def run_migrations_offline():
+    """Génère le SQL des migrations sans connexion"""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Applique les migrations sur la base configurée"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,86 @@
+"""Schéma initial (utilisateurs, patients, diagnostics, audit)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nom", sa.String(100), nullable=False),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column(
+            "role",
+            sa.Enum("MEDECIN", "ADMIN", "SUPER_ADMIN", name="userrole"),
+            nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "patients",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nom", sa.String(100), nullable=False),
+        sa.Column("prenom", sa.String(100), nullable=False),
+        sa.Column("date_naissance", sa.DateTime(), nullable=False),
+        sa.Column("sexe", sa.Enum("M", "F", name="sexe"), nullable=False),
+        sa.Column("telephone", sa.String(20)),
+        sa.Column("email", sa.String(255)),
+        sa.Column("adresse", sa.Text()),
+        sa.Column("medecin_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_patients_id", "patients", ["id"])
+
+    op.create_table(
+        "diagnostics",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("patients.id"), nullable=False),
+        sa.Column("medecin_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("date", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("modele_utilise", sa.String(100), nullable=False),
+        sa.Column("resultat", sa.Integer(), nullable=False),
+        sa.Column("probabilite", sa.Float(), nullable=False),
+        sa.Column("image_url", sa.String(500)),
+        sa.Column("notes", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_diagnostics_id", "diagnostics", ["id"])
+
+    op.create_table(
+        "audit_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("action", sa.String(100), nullable=False),
+        sa.Column("table_name", sa.String(50)),
+        sa.Column("record_id", sa.Integer()),
+        sa.Column("details", sa.Text()),
+        sa.Column("ip_address", sa.String(45)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_audit_logs_id", "audit_logs", ["id"])
+
+
+def downgrade():
+    op.drop_table("audit_logs")
+    op.drop_table("diagnostics")
+    op.drop_table("patients")
+    op.drop_table("users")
+    sa.Enum(name="sexe").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
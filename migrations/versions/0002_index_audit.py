@@ -0,0 +1,25 @@
+"""Index des requêtes de conformité sur audit_logs
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_audit_logs_created_at_id", "audit_logs", ["created_at", "id"])
+    op.create_index("ix_audit_logs_user_created", "audit_logs", ["user_id", "created_at"])
+    op.create_index("ix_audit_logs_table_record", "audit_logs", ["table_name", "record_id"])
+
+
+def downgrade():
+    op.drop_index("ix_audit_logs_table_record", table_name="audit_logs")
+    op.drop_index("ix_audit_logs_user_created", table_name="audit_logs")
+    op.drop_index("ix_audit_logs_created_at_id", table_name="audit_logs")
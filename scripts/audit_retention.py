@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Script de rétention du journal d'audit
+Déplace les entrées anciennes de audit_logs vers des tables d'archive
+mensuelles (audit_logs_AAAAMM) puis supprime les archives expirées.
+À planifier quotidiennement (cron).
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.audit import apply_audit_retention, AUDIT_HOT_DAYS, AUDIT_RETENTION_MONTHS
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivage et rétention du journal d'audit")
+    parser.add_argument(
+        "--hot-days", type=int, default=AUDIT_HOT_DAYS,
+        help="Nombre de jours conservés dans audit_logs"
+    )
+    parser.add_argument(
+        "--retention-months", type=int, default=AUDIT_RETENTION_MONTHS,
+        help="Nombre de mois d'archives conservés"
+    )
+    args = parser.parse_args()
+
+    moved, dropped = apply_audit_retention(args.hot_days, args.retention_months)
+    print(f"✅ {moved} entrées d'audit archivées")
+    if dropped:
+        print(f"🗑️  Archives supprimées: {', '.join(dropped)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Comparaison précision / latence des variantes ONNX d'un modèle
+Exécute les variantes fp32, optimisée et int8 sur un jeu d'images et
+mesure la latence (p50 / p95) et l'accord avec la variante fp32.
+
+Usage: python scripts/compare_models.py models/vit_v2_1.onnx images/ [--threads 1]
+"""
+
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.inference import OnnxBackend, VARIANTS
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+def list_images(directory: str, limit: int) -> list:
+    images = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return images[:limit] if limit else images
+
+def run_variant(backend: OnnxBackend, images: list, warmup: int) -> tuple[list, np.ndarray]:
+    """Retourne les prédictions et les latences (ms) d'une variante"""
+    backend.load()
+    for image in images[:warmup]:
+        backend.predict(image)
+
+    predictions = []
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        predictions.append(backend.predict(image))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return predictions, np.asarray(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison des variantes ONNX d'un modèle")
+    parser.add_argument("model", help="Modèle ONNX fp32 de référence")
+    parser.add_argument("images", help="Répertoire d'images de validation")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--threads", type=int, default=1, help="Threads intra-op")
+    parser.add_argument("--input-size", type=int, default=224)
+    parser.add_argument("--limit", type=int, default=0, help="Nombre maximal d'images")
+    parser.add_argument("--warmup", type=int, default=5)
+    args = parser.parse_args()
+
+    images = list_images(args.images, args.limit)
+    if not images:
+        print(f"❌ Aucune image trouvée dans {args.images}")
+        sys.exit(1)
+
+    variants = [variant.strip() for variant in args.variants.split(",")]
+    if "fp32" not in variants:
+        variants.insert(0, "fp32")
+
+    results = {}
+    for variant in variants:
+        backend = OnnxBackend(
+            args.model,
+            variant=variant,
+            input_size=args.input_size,
+            intra_op_threads=args.threads
+        )
+        predictions, latencies = run_variant(backend, images, args.warmup)
+        results[variant] = (backend, predictions, latencies)
+
+    reference = results["fp32"][1]
+    print(f"\n{len(images)} images, {args.threads} thread(s) intra-op\n")
+    print(f"{'variante':<10} {'taille Mo':>10} {'p50 ms':>8} {'p95 ms':>8} {'accord':>8} {'écart proba':>12}")
+    for variant, (backend, predictions, latencies) in results.items():
+        agreement = np.mean([p[0] == r[0] for p, r in zip(predictions, reference)])
+        delta = np.mean([abs(p[1] - r[1]) for p, r in zip(predictions, reference)])
+        size = os.path.getsize(backend.variant_path) / 1e6
+        print(
+            f"{variant:<10} {size:>10.1f} {np.percentile(latencies, 50):>8.2f} "
+            f"{np.percentile(latencies, 95):>8.2f} {agreement:>8.1%} {delta:>12.4f}"
+        )
+
+if __name__ == "__main__":
+    main()
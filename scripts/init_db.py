@@ -1,25 +1,47 @@
 #!/usr/bin/env python3
 """
 Script d'initialisation de la base de données
-Crée les tables et ajoute des données de test
+Crée les tables et ajoute des données de test ; peut aussi générer un
+volume synthétique réaliste (médecins, patients, diagnostics) :
+
+    python scripts/init_db.py --doctors 500 --patients-per-doctor 2000 --diagnostics-per-patient 5
 """
 
+import argparse
 import sys
 import os
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import SessionLocal, engine
-from app.models import Base, User, Patient, Diagnostic
+from sqlalchemy import func, insert
+from app.database import SessionLocal, engine, run_migrations
+from app.models import User, Patient, Diagnostic
 from app.auth import get_password_hash
 from app.models import UserRole, Sexe
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import random
 
+# Distributions de la génération synthétique
+NOMS = [
+    "Martin", "Bernard", "Thomas", "Petit", "Robert", "Richard", "Durand", "Dubois", "Moreau", "Laurent",
+    "Simon", "Michel", "Lefebvre", "Leroy", "Roux", "David", "Bertrand", "Morel", "Fournier", "Girard",
+    "Bonnet", "Dupont", "Lambert", "Fontaine", "Rousseau", "Vincent", "Muller", "Lefevre", "Faure", "Andre",
+]
+PRENOMS = {
+    Sexe.M: ["Jean", "Pierre", "Michel", "Philippe", "Alain", "Nicolas", "Luc", "Paul", "Louis", "Thomas"],
+    Sexe.F: ["Marie", "Nathalie", "Isabelle", "Sylvie", "Catherine", "Anne", "Claire", "Julie", "Emma", "Sophie"],
+}
+# Stades F0 à F4 (poids cumulés) : la majorité des examens ne montre pas de fibrose avancée
+RESULTAT_POIDS = [0.40, 0.65, 0.82, 0.93, 1.00]
+# Versions de modèles (poids cumulés) : les plus récentes sont les plus utilisées
+MODELES = ["Vision Transformer v2.1", "Vision Transformer v2.0", "ResNet-50 v1.3"]
+MODELE_POIDS = [0.6, 0.9, 1.0]
+
 def init_database():
     """Initialise la base de données avec des données de test"""
     
-    # Créer les tables
-    Base.metadata.create_all(bind=engine)
+    # Créer / mettre à jour les tables
+    run_migrations()
     
     db = SessionLocal()
     
@@ -29,18 +51,19 @@ def init_database():
             print("La base de données contient déjà des données. Skipping...")
             return
         
-        # Créer les utilisateurs de test
+        # Créer les utilisateurs de test (un seul hachage bcrypt par mot de passe)
+        medecin_hash = get_password_hash("password123")
         users = [
             User(
                 nom="Dr. Martin Dubois",
                 email="martin.dubois@hopital.fr",
-                password_hash=get_password_hash("password123"),
+                password_hash=medecin_hash,
                 role=UserRole.MEDECIN
             ),
             User(
                 nom="Dr. Sophie Laurent",
                 email="sophie.laurent@hopital.fr",
-                password_hash=get_password_hash("password123"),
+                password_hash=medecin_hash,
                 role=UserRole.MEDECIN
             ),
             User(
@@ -169,5 +192,160 @@ def init_database():
     finally:
         db.close()
 
+def _next_id(conn, model) -> int:
+    return (conn.execute(func.max(model.id).select()).scalar() or 0) + 1
+
+def _birth_date(rng: random.Random) -> datetime:
+    # Âge centré sur 55 ans (18 à 90 ans)
+    age = min(max(rng.gauss(55, 14), 18), 90)
+    return datetime(2024, 1, 1) - timedelta(days=int(age * 365.25))
+
+def _diagnostic_count(rng: random.Random, mean: float) -> int:
+    # Loi géométrique (au moins un examen) : beaucoup de patients avec un ou deux examens, quelques suivis longs
+    if mean <= 1:
+        return 1
+    p = 1.0 / mean
+    count = 1
+    while rng.random() > p:
+        count += 1
+    return count
+
+def generate_data(
+    doctors: int,
+    patients_per_doctor: int,
+    diagnostics_per_patient: float,
+    seed: int = 42,
+    chunk_size: int = 10000,
+    years: int = 3,
+    password: str = "password123",
+    email_domain: str = "fibrose.test",
+    end_date: datetime = datetime(2024, 6, 1)
+) -> dict:
+    """Génère un volume synthétique par insertions groupées (identifiants explicites, ids contigus par médecin)"""
+    rng = random.Random(seed)
+    password_hash = get_password_hash(password)
+    span_minutes = years * 365 * 24 * 60
+    counts = {"medecins": 0, "patients": 0, "diagnostics": 0}
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        user_id = _next_id(conn, User)
+        patient_id = _next_id(conn, Patient)
+        diagnostic_id = _next_id(conn, Diagnostic)
+
+        conn.execute(insert(User), [
+            {
+                "id": user_id + i,
+                "nom": f"Dr. {rng.choice(PRENOMS[Sexe.M] + PRENOMS[Sexe.F])} {rng.choice(NOMS)}",
+                "email": f"medecin{user_id + i}@{email_domain}",
+                "password_hash": password_hash,
+                "role": UserRole.MEDECIN,
+            }
+            for i in range(doctors)
+        ])
+        conn.commit()
+        counts["medecins"] = doctors
+
+        patients, diagnostics = [], []
+
+        def flush():
+            # Les patients sont insérés avant les diagnostics qui les référencent
+            if patients:
+                conn.execute(insert(Patient), patients)
+                patients.clear()
+            if diagnostics:
+                counts["diagnostics"] += len(diagnostics)
+                conn.execute(insert(Diagnostic), diagnostics)
+                diagnostics.clear()
+            conn.commit()
+
+        for medecin_id in range(user_id, user_id + doctors):
+            for _ in range(patients_per_doctor):
+                sexe = Sexe.M if rng.random() < 0.5 else Sexe.F
+                nom = rng.choice(NOMS)
+                prenom = rng.choice(PRENOMS[sexe])
+                # Contrôles tous les 3 à 12 mois, ramenés dans la période si le suivi est long
+                count = _diagnostic_count(rng, diagnostics_per_patient) if diagnostics_per_patient > 0 else 0
+                gaps = [rng.randint(90, 365) * 1440 for _ in range(max(count - 1, 0))]
+                total = sum(gaps)
+                if total > span_minutes:
+                    gaps = [gap * span_minutes // total for gap in gaps]
+                    total = sum(gaps)
+                # Première visite plus fréquente récemment (croissance de l'activité)
+                offset = int((span_minutes - total) * (1 - rng.random() ** 0.5))
+                visit = end_date - timedelta(minutes=total + offset)
+                patients.append({
+                    "id": patient_id,
+                    "nom": nom,
+                    "prenom": prenom,
+                    "date_naissance": _birth_date(rng),
+                    "sexe": sexe,
+                    "telephone": f"0{rng.randint(1, 7)} {rng.randrange(10 ** 8):08d}",
+                    "email": f"{prenom}.{nom}.{patient_id}@email.fr".lower() if rng.random() < 0.7 else None,
+                    "medecin_id": medecin_id,
+                    "created_at": visit,
+                })
+
+                stade = rng.choices(range(5), cum_weights=RESULTAT_POIDS)[0]
+                for gap in ([0] + gaps)[:count]:
+                    visit += timedelta(minutes=gap)
+                    # La fibrose progresse lentement d'un examen à l'autre
+                    if gap and rng.random() < 0.15:
+                        stade = min(stade + 1, 4)
+                    diagnostics.append({
+                        "id": diagnostic_id,
+                        "patient_id": patient_id,
+                        "medecin_id": medecin_id,
+                        "date": visit,
+                        "modele_utilise": rng.choices(MODELES, cum_weights=MODELE_POIDS)[0],
+                        "resultat": stade,
+                        "probabilite": round(0.5 + 0.49 * rng.betavariate(5, 2), 4),
+                        "created_at": visit,
+                    })
+                    diagnostic_id += 1
+
+                patient_id += 1
+                counts["patients"] += 1
+                if len(patients) >= chunk_size or len(diagnostics) >= chunk_size:
+                    flush()
+                    elapsed = time.perf_counter() - started
+                    print(
+                        f"  {counts['patients']} patients, {counts['diagnostics']} diagnostics "
+                        f"({(counts['patients'] + counts['diagnostics']) / elapsed:,.0f} lignes/s)",
+                        end="\r"
+                    )
+
+        flush()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"\n✅ {counts['medecins']} médecins, {counts['patients']} patients et "
+        f"{counts['diagnostics']} diagnostics générés en {elapsed:.1f} s"
+    )
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Initialisation et génération de données de test")
+    parser.add_argument("--doctors", type=int, default=0, help="Médecins synthétiques à générer")
+    parser.add_argument("--patients-per-doctor", type=int, default=100)
+    parser.add_argument("--diagnostics-per-patient", type=float, default=3, help="Moyenne par patient")
+    parser.add_argument("--seed", type=int, default=42, help="Graine (génération reproductible)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Lignes par insertion groupée")
+    parser.add_argument("--years", type=int, default=3, help="Période couverte par les diagnostics")
+    parser.add_argument("--password", default="password123", help="Mot de passe des médecins générés")
+    args = parser.parse_args()
+
+    init_database()
+    if args.doctors:
+        generate_data(
+            args.doctors,
+            args.patients_per_doctor,
+            args.diagnostics_per_patient,
+            seed=args.seed,
+            chunk_size=args.chunk_size,
+            years=args.years,
+            password=args.password
+        )
+
 if __name__ == "__main__":
-    init_database() 
\ No newline at end of file
+    main() 
\ No newline at end of file
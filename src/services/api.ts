@@ -96,6 +96,53 @@ export const patientService = {
     }
   },
 
+  async getDossier(id: number): Promise<ApiResponse<any>> {
+    try {
+      const token = authService.getToken();
+      if (!token) throw new Error('Token non trouvé');
+
+      const response = await fetch(`${API_BASE_URL}/patients/${id}/dossier`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+
+      if (!response.ok) {
+        throw new Error('Erreur lors de la récupération du dossier patient');
+      }
+
+      const data = await response.json();
+      return { data };
+    } catch (error) {
+      return { error: error instanceof Error ? error.message : 'Erreur de récupération du dossier patient' };
+    }
+  },
+
+  async getDossiers(ids: number[]): Promise<ApiResponse<any[]>> {
+    try {
+      const token = authService.getToken();
+      if (!token) throw new Error('Token non trouvé');
+
+      const url = new URL(`${API_BASE_URL}/patients/dossiers`);
+      url.searchParams.append('ids', ids.join(','));
+
+      const response = await fetch(url.toString(), {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+
+      if (!response.ok) {
+        throw new Error('Erreur lors de la récupération des dossiers patients');
+      }
+
+      const data = await response.json();
+      return { data };
+    } catch (error) {
+      return { error: error instanceof Error ? error.message : 'Erreur de récupération des dossiers patients' };
+    }
+  },
+
   async createPatient(patientData: any): Promise<ApiResponse<any>> {
     try {
       const token = authService.getToken();
@@ -207,7 +254,8 @@ export const diagnosticService = {
     patientId: number,
     image: File,
     modeleUtilise: string = "Vision Transformer v2.1",
-    notes?: string
+    notes?: string,
+    idempotencyKey?: string
   ): Promise<ApiResponse<any>> {
     try {
       const token = authService.getToken();
@@ -221,11 +269,17 @@ export const diagnosticService = {
         formData.append('notes', notes);
       }
 
+      // Réutiliser la même clé lors des nouvelles tentatives évite un double diagnostic
+      const headers: Record<string, string> = {
+        'Authorization': `Bearer ${token}`,
+      };
+      if (idempotencyKey) {
+        headers['Idempotency-Key'] = idempotencyKey;
+      }
+
       const response = await fetch(`${API_BASE_URL}/diagnostics/`, {
         method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
+        headers,
         body: formData,
       });
 
@@ -299,6 +353,36 @@ export const statsService = {
     }
   },
 
+  // Flux temps réel : instantané puis deltas (EventSource se reconnecte seul)
+  subscribe(
+    onSnapshot: (stats: any) => void,
+    onDelta: (type: 'diagnostic_cree' | 'diagnostics_supprimes', data: any) => void
+  ): () => void {
+    const token = authService.getToken();
+    if (!token) return () => {};
+
+    const url = new URL(`${API_BASE_URL}/stats/stream`);
+    url.searchParams.append('token', token);
+    const source = new EventSource(url.toString());
+    let sequence = 0;
+
+    source.addEventListener('snapshot', (event) => {
+      const stats = JSON.parse((event as MessageEvent).data);
+      sequence = stats.sequence;
+      onSnapshot(stats);
+    });
+    (['diagnostic_cree', 'diagnostics_supprimes'] as const).forEach((type) => {
+      source.addEventListener(type, (event) => {
+        const message = event as MessageEvent;
+        // Déjà inclus dans l'instantané
+        if (Number(message.lastEventId) <= sequence) return;
+        onDelta(type, JSON.parse(message.data));
+      });
+    });
+
+    return () => source.close();
+  },
+
   async getMedecinStats(): Promise<ApiResponse<any[]>> {
     try {
       const token = authService.getToken();
@@ -342,4 +426,47 @@ export const statsService = {
       return { error: error instanceof Error ? error.message : 'Erreur de récupération des performances des modèles' };
     }
   }
-}; 
\ No newline at end of file
+}; 
+// Requêtes groupées : plusieurs appels en un seul aller-retour
+export interface BatchSubRequest {
+  id?: string;
+  methode?: 'GET' | 'POST' | 'PUT' | 'DELETE';
+  chemin: string;
+  params?: Record<string, string | number>;
+  en_tetes?: Record<string, string>;
+  corps?: any;
+}
+
+export interface BatchSubResponse {
+  id?: string;
+  statut: number;
+  en_tetes: Record<string, string>;
+  corps: any;
+}
+
+export const batchService = {
+  async run(requetes: BatchSubRequest[]): Promise<ApiResponse<BatchSubResponse[]>> {
+    try {
+      const token = authService.getToken();
+      if (!token) throw new Error('Token non trouvé');
+
+      const response = await fetch(`${API_BASE_URL}/batch`, {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ requetes }),
+      });
+
+      if (!response.ok) {
+        throw new Error('Erreur lors de l\'exécution du lot de requêtes');
+      }
+
+      const data = await response.json();
+      return { data: data.reponses };
+    } catch (error) {
+      return { error: error instanceof Error ? error.message : 'Erreur d\'exécution du lot de requêtes' };
+    }
+  }
+};
@@ -4,6 +4,7 @@ Script de démarrage pour l'application Fibrose Hépatique
 Lance le serveur FastAPI avec les bonnes configurations
 """
 
+import argparse
 import os
 import sys
 import subprocess
@@ -49,9 +50,22 @@ def check_database():
         print("Vérifiez votre configuration dans .env")
         return False
 
+def migrate_database():
+    """Applique les migrations du schéma (une seule fois, avant le démarrage des workers)"""
+    print("🔧 Migration du schéma de la base de données...")
+    
+    try:
+        from app.database import run_migrations
+        run_migrations()
+        print("✅ Schéma à jour")
+        return True
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        return False
+
 def init_database():
-    """Initialise la base de données si nécessaire"""
-    print("🔧 Initialisation de la base de données...")
+    """Ajoute les données de test"""
+    print("🔧 Initialisation des données de test...")
     
     try:
         from scripts.init_db import init_database
@@ -61,7 +75,7 @@ def init_database():
         print(f"❌ Erreur lors de l'initialisation: {e}")
         return False
 
-def start_server():
+def start_server(production: bool = False):
     """Démarre le serveur FastAPI"""
     print("🚀 Démarrage du serveur FastAPI...")
     
@@ -72,20 +86,28 @@ def start_server():
     print(f"📍 Serveur accessible sur: http://{host}:{port}")
     print(f"📚 Documentation API: http://{host}:{port}/docs")
     print(f"📖 Documentation ReDoc: http://{host}:{port}/redoc")
-    print("\n🔄 Redémarrage automatique activé")
+    if production:
+        from app.server import WORKERS, MAX_REQUESTS
+        print(f"\n🏭 Mode production: {WORKERS} workers, recyclage après {MAX_REQUESTS} requêtes")
+    else:
+        print("\n🔄 Redémarrage automatique activé")
     print("⏹️  Appuyez sur Ctrl+C pour arrêter")
     print("-" * 50)
     
     # Démarrer le serveur
     try:
-        import uvicorn
-        uvicorn.run(
-            "app.main:app",
-            host=host,
-            port=port,
-            reload=True,
-            log_level="info"
-        )
+        if production:
+            from app.server import run_production
+            run_production(host, port)
+        else:
+            import uvicorn
+            uvicorn.run(
+                "app.main:app",
+                host=host,
+                port=port,
+                reload=True,
+                log_level="info"
+            )
     except KeyboardInterrupt:
         print("\n🛑 Serveur arrêté")
     except Exception as e:
@@ -93,6 +115,25 @@ def start_server():
 
 def main():
     """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Démarrage de l'API Fibrose Hépatique")
+    parser.add_argument(
+        "--prod",
+        action="store_true",
+        default=os.getenv("ENVIRONMENT") == "production",
+        help="Mode production (multi-workers, sans rechargement automatique)"
+    )
+    parser.add_argument(
+        "--seed",
+        action="store_true",
+        help="Ajoute les données de test si la base est vide"
+    )
+    parser.add_argument(
+        "--skip-migrations",
+        action="store_true",
+        help="Ne pas appliquer les migrations (déjà faites par le déploiement)"
+    )
+    args = parser.parse_args()
+    
     print("🏥 Application de Détection Précoce de Fibrose Hépatique")
     print("=" * 60)
     
@@ -107,12 +148,20 @@ def main():
         print("3. Vérifiez votre configuration dans .env")
         sys.exit(1)
     
-    # Initialiser la base de données
-    if not init_database():
+    # Mettre le schéma à jour (les workers ne font plus de DDL au démarrage)
+    if not args.skip_migrations and not migrate_database():
+        sys.exit(1)
+    
+    # Données de test uniquement sur demande
+    if args.seed and not init_database():
         print("⚠️  L'initialisation a échoué, mais on continue...")
     
+    # Ne pas transmettre aux workers les connexions ouvertes par les vérifications
+    from app.database import engine
+    engine.dispose()
+    
     # Démarrer le serveur
-    start_server()
+    start_server(production=args.prod)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Configuration des tests de l'API
+Base SQLite jetable remplie par le générateur de données, client de test
+authentifié par rôle et comptage des requêtes SQL / lignes lues pendant une
+requête HTTP (budgets de requêtes).
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+import pytest
+
+# Base et fichiers (uploads/, profiles/) dans un répertoire jetable, avant tout import de l'application
+WORKDIR = tempfile.mkdtemp(prefix="fibrose-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'tests.db')}"
+os.environ["SQL_ECHO"] = "false"
+os.chdir(WORKDIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.auth import get_password_hash
+from app.database import SessionLocal, engine, run_migrations
+from app.models import Diagnostic, Patient, User, UserRole, Sexe
+from scripts.init_db import generate_data
+
+PASSWORD = "password123"
+DOCTORS = 2
+PATIENTS_PER_DOCTOR = 30
+DIAGNOSTICS_PER_PATIENT = 3
+# Requêtes SQL listées au plus dans le message d'échec
+MAX_REPORTED_STATEMENTS = 50
+# Threads hors requête HTTP (écriture différée du journal d'audit)
+IGNORED_THREADS = {"audit-flusher"}
+
+
+class CountingCursor:
+    """Curseur DBAPI qui compte les lignes lues (entités ORM, colonnes, agrégats)"""
+
+    def __init__(self, cursor, counter: "QueryCounter"):
+        self._cursor = cursor
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._counter.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._counter.rows += len(rows)
+        return rows
+
+
+class QueryCounter:
+    """Requêtes SQL exécutées et lignes lues sur les curseurs pendant un bloc mesuré"""
+
+    def __init__(self):
+        self.active = False
+        self.statements: List[str] = []
+        self.rows = 0
+
+    def install(self):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "after_cursor_execute", self._on_executed)
+
+    def remove(self):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+        event.remove(engine, "after_cursor_execute", self._on_executed)
+
+    def _counts(self) -> bool:
+        return self.active and threading.current_thread().name not in IGNORED_THREADS
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._counts():
+            self.statements.append(" ".join(statement.split()))
+
+    def _on_executed(self, conn, cursor, statement, parameters, context, executemany):
+        # Le résultat est construit sur context.cursor juste après cet événement
+        if self._counts() and context is not None and context.cursor is cursor:
+            context.cursor = CountingCursor(cursor, self)
+
+    def start(self):
+        self.statements = []
+        self.rows = 0
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def report(self) -> str:
+        lines = [f"{len(self.statements)} requêtes SQL, {self.rows} lignes lues :"]
+        for index, statement in enumerate(self.statements[:MAX_REPORTED_STATEMENTS], start=1):
+            lines.append(f"  {index:>3}. {statement[:300]}")
+        if len(self.statements) > MAX_REPORTED_STATEMENTS:
+            lines.append(f"  ... {len(self.statements) - MAX_REPORTED_STATEMENTS} autres")
+        return "\n".join(lines)
+
+
+@pytest.fixture(scope="session")
+def seeded_database():
+    """Schéma migré, médecins medecin<n>@fibrose.test et leurs patients, administrateurs"""
+    run_migrations()
+    counts = generate_data(DOCTORS, PATIENTS_PER_DOCTOR, DIAGNOSTICS_PER_PATIENT, password=PASSWORD)
+    db = SessionLocal()
+    try:
+        password_hash = get_password_hash(PASSWORD)
+        db.add_all([
+            User(nom="Admin", email="admin@fibrose.test", password_hash=password_hash, role=UserRole.ADMIN),
+            User(nom="Super Admin", email="superadmin@fibrose.test", password_hash=password_hash, role=UserRole.SUPER_ADMIN),
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return counts
+
+
+@pytest.fixture(scope="session")
+def client(seeded_database):
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    """En-têtes Authorization par rôle : medecin, medecin2 (autre patientèle), admin, super-admin"""
+    headers = {}
+    for role, email in (
+        ("medecin", "medecin1@fibrose.test"),
+        ("medecin2", "medecin2@fibrose.test"),
+        ("admin", "admin@fibrose.test"),
+        ("super-admin", "superadmin@fibrose.test"),
+    ):
+        response = client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        headers[role] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return headers
+
+
+@pytest.fixture
+def records(seeded_database):
+    """Patient et diagnostic neufs du médecin 1 (cibles des modifications et suppressions)"""
+    db = SessionLocal()
+    try:
+        medecin_id = db.query(User.id).filter(User.email == "medecin1@fibrose.test").scalar()
+        patient = Patient(
+            nom="Budget",
+            prenom="Test",
+            date_naissance=datetime(1970, 1, 1),
+            sexe=Sexe.F,
+            medecin_id=medecin_id
+        )
+        db.add(patient)
+        db.flush()
+        diagnostic = Diagnostic(
+            patient_id=patient.id,
+            medecin_id=medecin_id,
+            modele_utilise="Vision Transformer v2.1",
+            resultat=2,
+            probabilite=0.85
+        )
+        db.add(diagnostic)
+        db.commit()
+        return {"patient_id": patient.id, "diagnostic_id": diagnostic.id, "medecin_id": medecin_id}
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="session")
+def query_counter():
+    counter = QueryCounter()
+    counter.install()
+    yield counter
+    counter.remove()
+
+
+@pytest.fixture
+def query_budget(query_counter):
+    """Bloc dont les requêtes SQL (et lignes lues) ne doivent pas dépasser le budget"""
+
+    @contextmanager
+    def budget(queries: int, rows: Optional[int] = None):
+        query_counter.start()
+        try:
+            yield query_counter
+        finally:
+            query_counter.stop()
+        exceeded = []
+        if len(query_counter.statements) > queries:
+            exceeded.append(f"requêtes SQL : {len(query_counter.statements)} > {queries}")
+        if rows is not None and query_counter.rows > rows:
+            exceeded.append(f"lignes lues : {query_counter.rows} > {rows}")
+        if exceeded:
+            pytest.fail(
+                "Budget de requêtes dépassé (" + ", ".join(exceeded) + ")\n" + query_counter.report(),
+                pytrace=False
+            )
+
+    return budget
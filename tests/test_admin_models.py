@@ -0,0 +1,56 @@
+"""
+Remplacement à chaud des modèles (POST /api/admin/models/{version}/load)
+"""
+
+import os
+import time
+
+from app.inference import SimulationBackend, model_registry
+
+SIMULATION = {"backend": "simulation", "warmup": 1}
+
+
+def wait_swap(client, headers, version: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get("/api/admin/models", headers=headers).json()
+        remplacement = status["versions"][version]["remplacement"]
+        if remplacement["etat"] not in ("chargement", "prechauffage") or time.monotonic() > deadline:
+            return status
+        time.sleep(0.05)
+
+
+def test_swap_replaces_version(client, auth_headers):
+    headers = auth_headers["admin"]
+    response = client.post("/api/admin/models/test-remplacement/load", json=SIMULATION, headers=headers)
+    assert response.status_code == 202, response.text
+
+    status = wait_swap(client, headers, "test-remplacement")
+    assert status["pid"] == os.getpid()
+    version = status["versions"]["test-remplacement"]
+    assert version["remplacement"]["etat"] == "actif"
+    assert version["charge"] is True
+    assert isinstance(model_registry.get("test-remplacement"), SimulationBackend)
+
+
+def test_swap_refused_with_several_workers(client, auth_headers, monkeypatch):
+    monkeypatch.setenv("APP_WORKERS", "4")
+    response = client.post("/api/admin/models/test-refus/load", json=SIMULATION, headers=auth_headers["admin"])
+
+    assert response.status_code == 409
+    assert "4 workers" in response.json()["detail"]
+    assert model_registry.swap_status("test-refus") is None
+
+
+def test_swap_invalid_configuration(client, auth_headers):
+    response = client.post(
+        "/api/admin/models/test-invalide/load",
+        json={"backend": "inconnu"},
+        headers=auth_headers["admin"]
+    )
+    assert response.status_code == 400
+
+
+def test_swap_requires_admin(client, auth_headers):
+    response = client.post("/api/admin/models/test-medecin/load", json=SIMULATION, headers=auth_headers["medecin"])
+    assert response.status_code == 403
@@ -0,0 +1,103 @@
+"""
+Contrôle d'admission des inférences (app/admission.py)
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.admission import InferenceLimiter
+
+
+async def _hold(limiter: InferenceLimiter, user_id, release: asyncio.Event, order: list):
+    async with limiter.slot(user_id):
+        order.append(user_id)
+        await release.wait()
+
+
+def test_per_user_limit_and_queue_saturation():
+    async def scenario():
+        limiter = InferenceLimiter(max_concurrency=1, max_queue=1, max_per_user=1, retry_after=7)
+        release, order = asyncio.Event(), []
+        running = asyncio.create_task(_hold(limiter, "a", release, order))
+        await asyncio.sleep(0)
+
+        # Deuxième analyse du même médecin : refusée sans attendre
+        with pytest.raises(HTTPException) as per_user:
+            async with limiter.slot("a"):
+                pass
+        queued = asyncio.create_task(_hold(limiter, "b", release, order))
+        await asyncio.sleep(0)
+        # File pleine : refus immédiat
+        with pytest.raises(HTTPException) as saturated:
+            async with limiter.slot("c"):
+                pass
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return limiter, per_user.value, saturated.value, order
+
+    limiter, per_user, saturated, order = asyncio.run(scenario())
+    assert per_user.status_code == 429
+    assert per_user.headers["Retry-After"] == "7"
+    assert saturated.status_code == 503
+    assert order == ["a", "b"]
+    stats = limiter.stats()
+    assert (stats["admises"], stats["refusees_utilisateur"], stats["refusees_file"]) == (2, 1, 1)
+    assert (stats["actives"], stats["en_attente"]) == (0, 0)
+
+
+def test_waiting_users_are_served_in_turn():
+    async def scenario():
+        limiter = InferenceLimiter(max_concurrency=1, max_queue=10, max_per_user=10)
+        order = []
+        gate = asyncio.Event()
+        first = asyncio.create_task(_hold(limiter, "a", gate, order))
+        await asyncio.sleep(0)
+        # Trois demandes de « a » en file avant celle de « b »
+        opened = asyncio.Event()
+        opened.set()
+        waiting = []
+        for user_id in ("a", "a", "a", "b"):
+            waiting.append(asyncio.create_task(_hold(limiter, user_id, opened, order)))
+            await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, *waiting)
+        return order
+
+    # « b » passe dès la deuxième place au lieu d'attendre les demandes de « a »
+    assert asyncio.run(scenario()) == ["a", "a", "b", "a", "a"]
+
+
+def test_queue_timeout_and_cancellation_release_their_place():
+    async def scenario():
+        limiter = InferenceLimiter(max_concurrency=1, max_queue=2, queue_timeout=0.05)
+        release, order = asyncio.Event(), []
+        running = asyncio.create_task(_hold(limiter, "a", release, order))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as timeout:
+            async with limiter.slot("b"):
+                pass
+        cancelled = asyncio.create_task(_hold(limiter, "c", release, order))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+
+        release.set()
+        await running
+        return limiter, timeout.value
+
+    limiter, timeout = asyncio.run(scenario())
+    assert timeout.status_code == 503
+    stats = limiter.stats()
+    assert stats["delais_depasses"] == 1
+    assert (stats["actives"], stats["en_attente"]) == (0, 0)
+
+
+def test_inference_status_is_admin_only(client, auth_headers):
+    assert client.get("/api/admin/inference", headers=auth_headers["medecin"]).status_code == 403
+    response = client.get("/api/admin/inference", headers=auth_headers["admin"])
+    assert response.status_code == 200
+    assert {"actives", "en_attente", "max_simultanees", "refusees_file"} <= response.json().keys()
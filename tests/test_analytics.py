@@ -0,0 +1,90 @@
+"""
+Instantané d'analyse en mémoire (app/analytics.py)
+"""
+
+import app.analytics as analytics
+from app.analytics import AnalyticsSnapshot
+from app.database import SessionLocal
+from app.models import Diagnostic
+
+
+def test_rebuilds_after_delete_by_other_worker(records, monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_RECONCILE_INTERVAL", 0)
+    db = SessionLocal()
+    try:
+        snapshot = AnalyticsSnapshot()
+        snapshot.refresh(db)
+        loaded = len(snapshot)
+
+        # Suppression faite ailleurs : discard() n'est pas appelé sur cet instantané
+        db.query(Diagnostic).filter(Diagnostic.id == records["diagnostic_id"]).delete()
+        db.commit()
+        snapshot.refresh(db)
+    finally:
+        db.close()
+
+    assert snapshot.rebuilds == 1
+    assert len(snapshot) == loaded - 1
+
+
+def test_picks_up_rows_committed_out_of_id_order(records, monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_RECONCILE_INTERVAL", 0)
+    db = SessionLocal()
+    try:
+        diagnostic = db.get(Diagnostic, records["diagnostic_id"])
+        values = {column: getattr(diagnostic, column) for column in ("patient_id", "medecin_id", "modele_utilise", "resultat", "probabilite")}
+        db.delete(diagnostic)
+        db.commit()
+
+        snapshot = AnalyticsSnapshot()
+        snapshot.refresh(db)
+        loaded = len(snapshot)
+        # Ligne validée après le rafraîchissement avec un id inférieur au dernier chargé
+        db.add(Diagnostic(id=records["diagnostic_id"], **values))
+        db.commit()
+        snapshot.refresh(db)
+    finally:
+        db.close()
+
+    assert len(snapshot) == loaded + 1
+
+
+def test_stage_matrix_ignores_out_of_range_results(records):
+    db = SessionLocal()
+    hors_bornes = Diagnostic(
+        patient_id=records["patient_id"],
+        medecin_id=records["medecin_id"],
+        modele_utilise="Modèle hors bornes",
+        resultat=7,
+        probabilite=1.5
+    )
+    try:
+        db.add(hors_bornes)
+        db.commit()
+        snapshot = AnalyticsSnapshot()
+        snapshot.refresh(db)
+    finally:
+        # Ne pas fausser les statistiques des autres tests
+        db.delete(hors_bornes)
+        db.commit()
+        db.close()
+
+    matrice = snapshot.stage_matrix(medecin_id=records["medecin_id"])
+    assert all(len(stades) == analytics.NB_STADES for stades in matrice.values())
+    assert matrice["Vision Transformer v2.1"][2] >= 1
+    # Probabilité hors de [0, 1] : rangée dans le dernier intervalle
+    calibration = snapshot.calibration(medecin_id=records["medecin_id"])
+    assert calibration["Modèle hors bornes"][-1]["count"] == 1
+
+
+def test_invalid_date_is_rejected(client, auth_headers):
+    for path in ("/api/stats/", "/api/stats/performance/stades", "/api/stats/performance/calibration"):
+        response = client.get(path, params={"start_date": "2024-13-45"}, headers=auth_headers["medecin"])
+        assert response.status_code == 400, path
+
+    response = client.get(
+        "/api/stats/performance/distribution",
+        params={"start_date": "2024-01-01", "end_date": "hier"},
+        headers=auth_headers["medecin"]
+    )
+    assert response.status_code == 400
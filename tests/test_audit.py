@@ -0,0 +1,158 @@
+"""
+Journalisation d'audit : file pleine et base indisponible sans perte d'entrées (app/audit.py)
+"""
+
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+import app.audit as audit
+from app.audit import AuditQueue
+from app.database import SessionLocal, engine
+from app.models import AuditLog
+
+
+@pytest.fixture
+def logged(seeded_database):
+    """Détails des entrées d'audit écrites par le test (supprimées ensuite)"""
+    marker = "test-debordement"
+
+    def details():
+        db = SessionLocal()
+        try:
+            return sorted(
+                row.details for row in
+                db.query(AuditLog.details).filter(AuditLog.details.like(f"{marker}%"))
+            )
+        finally:
+            db.close()
+
+    yield marker, details
+    db = SessionLocal()
+    try:
+        db.query(AuditLog).filter(AuditLog.details.like(f"{marker}%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_full_queue_spills_to_disk_then_drains(tmp_path, logged):
+    marker, details = logged
+    queue = AuditQueue(max_size=1, flush_interval=0.05, spill_dir=str(tmp_path))
+    for i in range(3):
+        queue.record("lecture", details=f"{marker} {i}")
+
+    assert len(queue) == 1
+    assert queue.spilled == 2
+    assert len(list(tmp_path.glob("audit-*.jsonl"))) == 1
+
+    queue.start()
+    queue.stop()
+
+    assert details() == [f"{marker} {i}" for i in range(3)]
+    assert queue.written == 3
+    assert queue.dropped == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_write_is_kept_for_retry(tmp_path, logged, monkeypatch):
+    marker, details = logged
+    queue = AuditQueue(spill_dir=str(tmp_path))
+
+    class Unavailable:
+        def execute(self, *args, **kwargs):
+            raise RuntimeError("base indisponible")
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(audit, "SessionLocal", Unavailable)
+    queue.record("creation", details=f"{marker} panne")
+    assert not queue._flush([queue._queue.get_nowait()])
+    assert queue.failed == 1
+    assert details() == []
+
+    monkeypatch.undo()
+    assert queue._drain_spill()
+    assert details() == [f"{marker} panne"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_of_stopped_worker_is_drained(tmp_path, logged):
+    marker, details = logged
+    # PID d'un processus terminé : son fichier est repris par un autre worker
+    child = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    pid = int(child.stdout)
+    entry = {
+        "user_id": None, "action": "lecture", "table_name": "patients", "record_id": None,
+        "details": f"{marker} orphelin", "ip_address": None, "created_at": "2024-05-01T10:00:00",
+    }
+    (tmp_path / f"audit-{pid}.jsonl").write_text(json.dumps(entry) + "\n")
+    # Fichier d'un processus vivant : laissé à son propriétaire
+    (tmp_path / f"audit-{os.getppid()}.jsonl").write_text(json.dumps({**entry, "details": f"{marker} vivant"}) + "\n")
+
+    assert AuditQueue(spill_dir=str(tmp_path))._drain_spill()
+    assert details() == [f"{marker} orphelin"]
+    assert [path.name for path in tmp_path.iterdir()] == [f"audit-{os.getppid()}.jsonl"]
+
+
+@pytest.fixture
+def archived(logged):
+    """Entrées de janvier et mars 2020 archivées (tables d'archive supprimées ensuite)"""
+    marker, details = logged
+    db = SessionLocal()
+    try:
+        db.add_all([
+            AuditLog(action="lecture", details=f"{marker} janvier", created_at=datetime(2020, 1, 15, 9)),
+            AuditLog(action="lecture", details=f"{marker} mars", created_at=datetime(2020, 3, 10, 9)),
+        ])
+        db.commit()
+    finally:
+        db.close()
+    moved = audit.archive_audit_logs(datetime(2020, 4, 1))
+    yield moved
+    with engine.connect() as conn:
+        for month in audit.list_archive_months():
+            if month.startswith("2020"):
+                audit.archive_table(month).drop(conn)
+        conn.commit()
+
+
+def test_archiving_skips_months_without_entries(archived):
+    assert archived == 2
+    assert [month for month in audit.list_archive_months() if month.startswith("2020")] == ["202001", "202003"]
+
+
+def test_audit_query_spans_live_table_and_archives(archived, client, auth_headers, logged):
+    marker, _ = logged
+    db = SessionLocal()
+    try:
+        db.add(AuditLog(action="lecture", details=f"{marker} courant", created_at=datetime(2020, 3, 20, 9)))
+        db.commit()
+    finally:
+        db.close()
+
+    params = {"start_date": "2020-01-01", "end_date": "2020-03-31", "limit": 2}
+    headers = auth_headers["admin"]
+    first = client.get("/api/admin/audit", params=params, headers=headers).json()
+    second = client.get(
+        "/api/admin/audit", params={**params, "cursor": first["next_cursor"]}, headers=headers
+    ).json()
+
+    assert [item["details"] for item in first["items"] + second["items"]] == [
+        f"{marker} courant", f"{marker} mars", f"{marker} janvier"
+    ]
+    assert second["next_cursor"] is None
+
+    # Période hors des archives : seule la table courante est lue
+    february = client.get(
+        "/api/admin/audit", params={"start_date": "2020-02-01", "end_date": "2020-02-29"}, headers=headers
+    ).json()
+    assert february["items"] == []
@@ -0,0 +1,100 @@
+"""
+Requêtes groupées (POST /api/batch)
+"""
+
+import threading
+
+import app.routers.stats as stats_router
+
+
+def run_batch(client, headers, requetes):
+    response = client.post("/api/batch", json={"requetes": requetes}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {reponse["id"]: reponse for reponse in response.json()["reponses"]}
+
+
+def test_write_is_visible_to_following_read(client, auth_headers):
+    reponses = run_batch(client, auth_headers["medecin"], [
+        {"id": "creation", "methode": "POST", "chemin": "/api/patients/", "corps": {
+            "nom": "Lot", "prenom": "Visible", "date_naissance": "1975-05-05T00:00:00", "sexe": "F"
+        }},
+        {"id": "recherche", "chemin": "/api/patients/", "params": {"search": "Visible"}},
+    ])
+
+    assert reponses["creation"]["statut"] == 200
+    assert [patient["id"] for patient in reponses["recherche"]["corps"]] == [reponses["creation"]["corps"]["id"]]
+
+
+def test_consecutive_reads_run_concurrently(client, auth_headers, monkeypatch):
+    # Chaque lecture attend l'autre : le lot n'aboutit que si elles s'exécutent ensemble
+    barrier = threading.Barrier(2, timeout=5)
+    refresh = stats_router.snapshot.refresh
+
+    def refresh_together(db):
+        barrier.wait()
+        refresh(db)
+
+    monkeypatch.setattr(stats_router.snapshot, "refresh", refresh_together)
+    reponses = run_batch(client, auth_headers["medecin"], [
+        {"id": "stades", "chemin": "/api/stats/performance/stades"},
+        {"id": "calibration", "chemin": "/api/stats/performance/calibration"},
+    ])
+
+    assert [reponse["statut"] for reponse in reponses.values()] == [200, 200]
+
+
+def test_read_before_write_does_not_see_it(client, auth_headers):
+    requete = {"chemin": "/api/patients/", "params": {"search": "Ordonne"}}
+    reponses = run_batch(client, auth_headers["medecin"], [
+        {"id": "avant", **requete},
+        {"id": "creation", "methode": "POST", "chemin": "/api/patients/", "corps": {
+            "nom": "Lot", "prenom": "Ordonne", "date_naissance": "1975-05-05T00:00:00", "sexe": "M"
+        }},
+        {"id": "apres", **requete},
+    ])
+
+    assert list(reponses) == ["avant", "creation", "apres"]
+    assert reponses["avant"]["corps"] == []
+    assert len(reponses["apres"]["corps"]) == 1
+
+
+def test_sub_request_errors_do_not_fail_batch(client, auth_headers, monkeypatch):
+    def boom(*args, **kwargs):
+        raise RuntimeError("statistiques indisponibles")
+
+    monkeypatch.setattr(stats_router, "compute_statistics", boom)
+    reponses = run_batch(client, auth_headers["medecin"], [
+        {"id": "stats", "chemin": "/api/stats/"},
+        {"id": "absent", "chemin": "/api/patients/999999"},
+        {"id": "me", "chemin": "/api/auth/me"},
+    ])
+
+    assert reponses["stats"]["statut"] == 500
+    assert reponses["stats"]["corps"] == {"detail": "Erreur interne du serveur"}
+    assert reponses["absent"]["statut"] == 404
+    assert reponses["me"]["statut"] == 200
+    assert reponses["me"]["corps"]["email"] == "medecin1@fibrose.test"
+
+
+def test_etag_in_sub_request(client, auth_headers, records):
+    path = f"/api/diagnostics/{records['diagnostic_id']}"
+    etag = client.get(path, headers=auth_headers["medecin"]).headers["ETag"]
+    reponses = run_batch(client, auth_headers["medecin"], [
+        {"id": "diagnostic", "chemin": path, "en_tetes": {"If-None-Match": etag}},
+    ])
+
+    assert reponses["diagnostic"]["statut"] == 304
+    assert reponses["diagnostic"]["corps"] is None
+
+
+def test_forbidden_paths_and_headers(client, auth_headers):
+    headers = auth_headers["medecin"]
+    recursive = client.post("/api/batch", json={"requetes": [{"chemin": "/api/batch"}]}, headers=headers)
+    authorization = client.post(
+        "/api/batch",
+        json={"requetes": [{"chemin": "/api/auth/me", "en_tetes": {"Authorization": "Bearer x"}}]},
+        headers=headers
+    )
+
+    assert recursive.status_code == 400
+    assert authorization.status_code == 400
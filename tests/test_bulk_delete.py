@@ -0,0 +1,71 @@
+"""
+Suppression en masse des patients et diagnostics
+"""
+
+from app.database import SessionLocal
+from app.models import Diagnostic, Patient
+
+
+def test_patients_bulk_delete_removes_diagnostics(client, auth_headers, records):
+    response = client.post(
+        "/api/patients/bulk-delete",
+        json={"ids": [records["patient_id"]]},
+        headers=auth_headers["medecin"]
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"patients_supprimes": 1, "diagnostics_supprimes": 1}
+    db = SessionLocal()
+    try:
+        assert db.get(Patient, records["patient_id"]) is None
+        assert db.get(Diagnostic, records["diagnostic_id"]) is None
+    finally:
+        db.close()
+
+
+def test_patients_bulk_delete_requires_criteria_and_ownership(client, auth_headers, records):
+    empty = client.post("/api/patients/bulk-delete", json={}, headers=auth_headers["medecin"])
+    foreign = client.post(
+        "/api/patients/bulk-delete",
+        json={"ids": [records["patient_id"]]},
+        headers=auth_headers["medecin2"]
+    )
+
+    assert empty.status_code == 400
+    assert foreign.status_code == 403
+    db = SessionLocal()
+    try:
+        assert db.get(Patient, records["patient_id"]) is not None
+    finally:
+        db.close()
+
+
+def test_diagnostics_bulk_delete_by_ids(client, auth_headers, records):
+    response = client.post(
+        "/api/diagnostics/bulk-delete",
+        json={"ids": [records["diagnostic_id"]]},
+        headers=auth_headers["medecin"]
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["diagnostics_supprimes"] == 1
+    db = SessionLocal()
+    try:
+        assert db.get(Diagnostic, records["diagnostic_id"]) is None
+    finally:
+        db.close()
+
+
+def test_diagnostics_bulk_delete_foreign_ids_forbidden(client, auth_headers, records):
+    response = client.post(
+        "/api/diagnostics/bulk-delete",
+        json={"ids": [records["diagnostic_id"]]},
+        headers=auth_headers["medecin2"]
+    )
+
+    assert response.status_code == 403
+    db = SessionLocal()
+    try:
+        assert db.get(Diagnostic, records["diagnostic_id"]) is not None
+    finally:
+        db.close()
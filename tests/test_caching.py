@@ -0,0 +1,90 @@
+"""
+Requêtes conditionnelles (ETag / If-None-Match) sur les patients et diagnostics
+"""
+
+from app.database import SessionLocal
+from app.models import Diagnostic
+
+
+def test_patients_list_revalidation(client, auth_headers):
+    headers = auth_headers["medecin"]
+    first = client.get("/api/patients/", params={"limit": 20}, headers=headers)
+    etag = first.headers["ETag"]
+
+    unchanged = client.get("/api/patients/", params={"limit": 20}, headers={**headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert unchanged.content == b""
+
+    # Nouveau patient : la page qui le contient change
+    etag = client.get("/api/patients/", params={"limit": 1000}, headers=headers).headers["ETag"]
+    client.post(
+        "/api/patients/",
+        json={"nom": "Etag", "prenom": "Nouveau", "date_naissance": "1990-01-01T00:00:00", "sexe": "F"},
+        headers=headers
+    )
+    changed = client.get("/api/patients/", params={"limit": 1000}, headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_diagnostic_detail_revalidation(client, auth_headers, records):
+    headers = auth_headers["medecin"]
+    path = f"/api/diagnostics/{records['diagnostic_id']}"
+    first = client.get(path, headers=headers)
+    etag = first.headers["ETag"]
+
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    unchanged = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    # Comparaison faible : le préfixe W/ est ignoré
+    assert client.get(path, headers={**headers, "If-None-Match": etag.removeprefix("W/")}).status_code == 304
+
+
+def test_diagnostics_list_revalidation_after_delete(client, auth_headers, records):
+    headers = auth_headers["medecin"]
+    params = {"patient_id": records["patient_id"]}
+    etag = client.get("/api/diagnostics/", params=params, headers=headers).headers["ETag"]
+    assert client.get("/api/diagnostics/", params=params, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    client.delete(f"/api/diagnostics/{records['diagnostic_id']}", headers=headers)
+    response = client.get("/api/diagnostics/", params=params, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_patients_list_sees_edits_within_the_same_second(client, auth_headers, records):
+    headers = auth_headers["medecin"]
+    params = {"search": "Budget", "limit": 1000}
+    path = f"/api/patients/{records['patient_id']}"
+    etags = [client.get("/api/patients/", params=params, headers=headers).headers["ETag"]]
+    # Deux modifications rapprochées : updated_at peut rester identique à la seconde près
+    for telephone in ("0600000001", "0600000002"):
+        client.put(path, json={"telephone": telephone}, headers=headers)
+        response = client.get("/api/patients/", params=params, headers={**headers, "If-None-Match": etags[-1]})
+        assert response.status_code == 200
+        etags.append(response.headers["ETag"])
+    assert len(set(etags)) == 3
+
+
+def test_diagnostic_detail_with_reused_id(client, auth_headers, records):
+    headers = auth_headers["medecin"]
+    path = f"/api/diagnostics/{records['diagnostic_id']}"
+    etag = client.get(path, headers=headers).headers["ETag"]
+
+    # SQLite réattribue le plus grand rowid libéré : même ID, autre diagnostic
+    db = SessionLocal()
+    try:
+        diagnostic = db.get(Diagnostic, records["diagnostic_id"])
+        values = {column: getattr(diagnostic, column) for column in ("patient_id", "medecin_id", "modele_utilise")}
+        db.delete(diagnostic)
+        db.commit()
+        db.add(Diagnostic(id=records["diagnostic_id"], resultat=3, probabilite=0.6, **values))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["resultat"] == 3
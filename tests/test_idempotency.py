@@ -0,0 +1,71 @@
+"""
+Clés d'idempotence sur la création de diagnostics (en-tête Idempotency-Key)
+"""
+
+import asyncio
+
+from app.idempotency import IdempotencyStore
+
+IMAGE = b"\x89PNG\r\n\x1a\n" + b"\x00" * 512
+
+
+def create(client, headers, patient_id, key, notes=None):
+    params = {"patient_id": patient_id}
+    if notes is not None:
+        params["notes"] = notes
+    return client.post(
+        "/api/diagnostics/",
+        params=params,
+        files={"image": ("coupe.png", IMAGE, "image/png")},
+        headers={**headers, "Idempotency-Key": key}
+    )
+
+
+def test_replay_returns_original_response(client, auth_headers, records):
+    first = create(client, auth_headers["medecin"], records["patient_id"], "cle-rejouee")
+    second = create(client, auth_headers["medecin"], records["patient_id"], "cle-rejouee")
+
+    assert first.status_code == 200, first.text
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+
+    listing = client.get("/api/diagnostics/", params={"patient_id": records["patient_id"]}, headers=auth_headers["medecin"])
+    assert len(listing.json()) == 2  # diagnostic du fixture + un seul créé
+
+
+def test_key_reused_for_other_request_is_rejected(client, auth_headers, records):
+    assert create(client, auth_headers["medecin"], records["patient_id"], "cle-conflit").status_code == 200
+    response = create(client, auth_headers["medecin"], records["patient_id"], "cle-conflit", notes="autre")
+    assert response.status_code == 422
+
+
+def test_failed_request_is_not_memorised(client, auth_headers, records):
+    foreign = create(client, auth_headers["medecin2"], records["patient_id"], "cle-echec")
+    assert foreign.status_code == 403
+    # Même clé, même utilisateur : la requête est relancée, pas rejouée
+    again = create(client, auth_headers["medecin2"], records["patient_id"], "cle-echec")
+    assert again.status_code == 403
+    assert "Idempotent-Replayed" not in again.headers
+
+
+def test_key_shared_between_workers(seeded_database):
+    """Deux stockages distincts (deux workers) ne traitent la même clé qu'une fois"""
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return b'{"id": 1}'
+
+    async def scenario():
+        return await asyncio.gather(
+            IdempotencyStore().run(("test", "partagee"), "empreinte", work),
+            IdempotencyStore().run(("test", "partagee"), "empreinte", work),
+        )
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert {body for body, _ in results} == {b'{"id": 1}'}
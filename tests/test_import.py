@@ -0,0 +1,74 @@
+"""
+Import en masse des patients (POST /api/patients/import)
+"""
+
+from sqlalchemy import text
+
+from app.database import SessionLocal, engine
+from app.models import Patient
+
+HEADER = "nom,prenom,date_naissance,sexe\n"
+
+
+def import_csv(client, headers, content: bytes):
+    return client.post(
+        "/api/patients/import",
+        files={"file": ("patients.csv", content, "text/csv")},
+        headers=headers
+    )
+
+
+def test_import_reports_invalid_rows(client, auth_headers):
+    content = (
+        HEADER
+        + "Import,Valide,1980-01-01T00:00:00,M\n"
+        + "Import,SansDate,,F\n"
+        + "Import,Sexe,1981-02-02T00:00:00,X\n"
+    ).encode()
+    response = import_csv(client, auth_headers["medecin"], content)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["total"], body["importes"], body["rejetes"]) == (3, 1, 2)
+    assert [erreur["ligne"] for erreur in body["erreurs"]] == [3, 4]
+
+
+def test_import_rejects_non_utf8_file(client, auth_headers):
+    content = (HEADER + "Hélène,Çà,1980-01-01T00:00:00,F\n").encode("latin-1")
+    db = SessionLocal()
+    try:
+        before = db.query(Patient).count()
+        response = import_csv(client, auth_headers["medecin"], content)
+        after = db.query(Patient).count()
+    finally:
+        db.close()
+
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["detail"]
+    assert after == before
+
+
+def test_import_database_error_rejects_only_failing_rows(client, auth_headers):
+    # Déclencheur SQLite : la base refuse les patients nommés "Refuse"
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER refuse_import BEFORE INSERT ON patients WHEN NEW.nom = 'Refuse' "
+            "BEGIN SELECT RAISE(ABORT, 'refus'); END"
+        ))
+    try:
+        content = (
+            HEADER
+            + "Lot,Un,1980-01-01T00:00:00,M\n"
+            + "Refuse,Deux,1980-01-01T00:00:00,F\n"
+            + "Lot,Trois,1980-01-01T00:00:00,F\n"
+        ).encode()
+        response = import_csv(client, auth_headers["medecin"], content)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TRIGGER refuse_import"))
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["importes"], body["rejetes"]) == (2, 1)
+    assert body["erreurs"][0]["ligne"] == 3
+    assert "base de données" in body["erreurs"][0]["erreurs"][0]
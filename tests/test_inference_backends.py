@@ -0,0 +1,91 @@
+"""
+Backends d'inférence : simulation et ONNX Runtime avec ses variantes (app/inference.py)
+"""
+
+import pytest
+
+from app.inference import OnnxBackend, SimulationBackend, create_backend
+
+INPUT_SIZE = 8
+
+
+@pytest.fixture
+def onnx_model(tmp_path):
+    """Modèle ONNX minimal : moyenne par canal puis couche linéaire vers 5 stades"""
+    pytest.importorskip("onnxruntime")
+    onnx = pytest.importorskip("onnx")
+    import numpy as np
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    graph = helper.make_graph(
+        [
+            helper.make_node("GlobalAveragePool", ["image"], ["pooled"]),
+            helper.make_node("Flatten", ["pooled"], ["features"]),
+            helper.make_node("Gemm", ["features", "weights", "bias"], ["logits"]),
+        ],
+        "fibrose",
+        [helper.make_tensor_value_info("image", TensorProto.FLOAT, [1, 3, INPUT_SIZE, INPUT_SIZE])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, [1, 5])],
+        initializer=[
+            numpy_helper.from_array(rng.standard_normal((3, 5), dtype=np.float32), "weights"),
+            numpy_helper.from_array(np.zeros(5, dtype=np.float32), "bias"),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    path = tmp_path / "fibrose.onnx"
+    onnx.save(model, str(path))
+    return path
+
+
+@pytest.fixture
+def image(tmp_path):
+    from PIL import Image
+
+    path = tmp_path / "echographie.png"
+    Image.new("RGB", (32, 32), (120, 60, 200)).save(path)
+    return path
+
+
+def test_simulation_backend():
+    backend = create_backend({})
+    assert isinstance(backend, SimulationBackend)
+    resultat, probabilite = backend.predict("inutile.png")
+    assert 0 <= resultat <= 4
+    assert 0.6 <= probabilite <= 0.95
+
+
+@pytest.mark.parametrize("variant", ["fp32", "optimized", "int8"])
+def test_onnx_variants_predict(onnx_model, image, variant):
+    backend = create_backend({
+        "backend": "onnx", "path": str(onnx_model), "variant": variant, "input_size": INPUT_SIZE
+    })
+    # Variantes générées à partir du modèle fp32 avant le chargement
+    backend.prepare()
+    assert (onnx_model.parent / {"fp32": "fibrose.onnx", "optimized": "fibrose.optimized.onnx",
+                                 "int8": "fibrose.int8.onnx"}[variant]).exists()
+
+    backend.warmup(2)
+    resultat, probabilite = backend.predict(str(image))
+    assert 0 <= resultat <= 4
+    assert 0.2 <= probabilite <= 1.0
+    assert backend.memory_bytes() > 0
+    assert backend.describe()["variante"] == variant
+
+    backend.unload()
+    assert backend.memory_bytes() == 0
+
+
+def test_variants_agree_with_fp32(onnx_model, image):
+    fp32 = OnnxBackend(str(onnx_model), input_size=INPUT_SIZE)
+    optimized = OnnxBackend(str(onnx_model), variant="optimized", input_size=INPUT_SIZE)
+    assert fp32.predict(str(image)) == pytest.approx(optimized.predict(str(image)), rel=1e-5)
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        OnnxBackend("modele.onnx", variant="fp16")
+    with pytest.raises(ValueError):
+        create_backend({"backend": "tensorrt"})
+    with pytest.raises(KeyError):
+        create_backend({"backend": "onnx"})
@@ -0,0 +1,90 @@
+"""
+Métriques Prometheus : registre par threads, agrégation multi-workers, /metrics (app/metrics.py)
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from app.metrics import Registry, _render, merge_exports
+
+
+def _dead_pid() -> int:
+    child = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    return int(child.stdout)
+
+
+def test_counters_and_histograms_sum_thread_shards():
+    registry = Registry()
+    requests = registry.counter("requetes", "Requêtes", ("route",))
+    duration = registry.histogram("duree_seconds", "Durée", buckets=(0.1, 1.0))
+
+    def work():
+        for _ in range(1000):
+            requests.inc(labels=("/api/patients/",))
+            duration.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    text = _render(registry.collect())
+    assert 'requetes_total{route="/api/patients/"} 4000' in text
+    assert 'duree_seconds_bucket{le="0.1"} 0' in text
+    assert 'duree_seconds_bucket{le="1"} 4000' in text
+    assert 'duree_seconds_bucket{le="+Inf"} 4000' in text
+    assert "duree_seconds_count 4000" in text
+
+
+def test_failing_gauge_does_not_break_collection():
+    registry = Registry()
+    registry.gauge("cassee", "Jauge en échec", lambda: 1 / 0)
+    registry.gauge("absente", "Jauge sans valeur", lambda: None)
+    registry.gauge("file", "Jauge", lambda: 3)
+    text = _render(registry.collect())
+    assert "file 3" in text
+    assert "cassee" not in text
+    assert "\nabsente " not in text
+
+
+def test_merge_exports_across_workers(tmp_path):
+    live, dead = os.getpid(), _dead_pid()
+    for pid, count in ((live, 2), (dead, 5)):
+        (tmp_path / f"{pid}.json").write_text(json.dumps([
+            {"name": "requetes", "help": "Requêtes", "type": "counter",
+             "samples": [["requetes_total", [["route", "/"]], count]]},
+            {"name": "file", "help": "File", "type": "gauge", "samples": [["file", [], count]]},
+        ]))
+    # Export en cours d'écriture : ignoré
+    (tmp_path / "123.json.tmp").write_text("{")
+
+    text = _render(merge_exports(str(tmp_path)))
+    # Compteurs du worker arrêté conservés, jauges des seuls workers vivants (étiquetées par pid)
+    assert 'requetes_total{route="/"} 7' in text
+    assert f'file{{pid="{live}"}} 2' in text
+    assert f'pid="{dead}"' not in text
+
+
+def test_metrics_endpoint(client, auth_headers):
+    client.get("/api/patients/", headers=auth_headers["medecin"])
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/api/patients/",status="200"}' in text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    # Pool de connexions du mode SQLite : jauge renseignée
+    assert "db_pool_connections_in_use " in text
+    assert "audit_queue_size " in text
+
+
+def test_metrics_token(client, monkeypatch):
+    import app.main
+
+    monkeypatch.setattr(app.main, "METRICS_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
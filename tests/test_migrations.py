@@ -0,0 +1,76 @@
+"""
+Démarrage sans DDL et migrations Alembic (app/main.py, app/database.py)
+Chaque scénario s'exécute dans un processus neuf sur sa propre base SQLite.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = """
+import json
+from sqlalchemy import inspect, text
+from app.database import engine
+inspector = inspect(engine)
+tables = sorted(inspector.get_table_names())
+version = None
+if "alembic_version" in tables:
+    with engine.connect() as conn:
+        version = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+indexes = sorted(index["name"] for index in inspector.get_indexes("audit_logs")) if "audit_logs" in tables else []
+print(json.dumps({"tables": tables, "version": version, "indexes": indexes}))
+"""
+
+
+def _run(database, code: str) -> dict:
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}", "SQL_ECHO": "false"}
+    result = subprocess.run(
+        [sys.executable, "-c", code + SCHEMA], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_importing_the_application_runs_no_ddl(tmp_path):
+    schema = _run(tmp_path / "vide.db", "import app.main\n")
+    assert schema["tables"] == []
+
+
+def test_migrations_create_the_schema(tmp_path):
+    schema = _run(tmp_path / "neuve.db", "from app.database import run_migrations\nrun_migrations()\n")
+    assert {"users", "patients", "diagnostics", "audit_logs", "idempotency_keys"} <= set(schema["tables"])
+    assert schema["version"] == "0003"
+    assert "ix_audit_logs_created_at_id" in schema["indexes"]
+
+
+def test_legacy_database_is_stamped_then_upgraded(tmp_path):
+    # Base créée par create_all avant Alembic, sans les index d'audit ni les clés d'idempotence
+    legacy = (
+        "from sqlalchemy import text\n"
+        "from app.database import Base, engine, run_migrations\n"
+        "import app.models\n"
+        "Base.metadata.create_all(bind=engine)\n"
+        "with engine.begin() as conn:\n"
+        "    conn.execute(text('DROP TABLE idempotency_keys'))\n"
+        "    for name in ('ix_audit_logs_created_at_id', 'ix_audit_logs_user_created', 'ix_audit_logs_table_record'):\n"
+        "        conn.execute(text(f'DROP INDEX IF EXISTS {name}'))\n"
+        "run_migrations()\n"
+    )
+    schema = _run(tmp_path / "ancienne.db", legacy)
+    assert schema["version"] == "0003"
+    assert "idempotency_keys" in schema["tables"]
+    assert "ix_audit_logs_created_at_id" in schema["indexes"]
+
+
+def test_current_database_created_without_alembic_is_only_stamped(tmp_path):
+    schema = _run(
+        tmp_path / "courante.db",
+        "from app.database import Base, engine, run_migrations\n"
+        "import app.models\n"
+        "Base.metadata.create_all(bind=engine)\n"
+        "run_migrations()\n"
+    )
+    assert schema["version"] == "0003"
@@ -0,0 +1,54 @@
+"""
+Profilage à la demande (en-tête X-Profile) et consultation des profils (app/profiling.py)
+"""
+
+from app.profiling import RequestProfile, list_profile_ids, rotate_profiles
+
+
+def test_admin_profile_is_recorded(client, auth_headers):
+    headers = auth_headers["admin"]
+    response = client.get("/api/stats/medecins", headers={**headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    listed = client.get("/api/admin/profiles", headers=headers).json()
+    assert profile_id in [profile["id"] for profile in listed]
+    # Liste résumée : les spans ne sont donnés que par le détail
+    assert all("spans" not in profile for profile in listed)
+
+    detail = client.get(f"/api/admin/profiles/{profile_id}", params={"format": "json"}, headers=headers).json()
+    assert (detail["methode"], detail["chemin"], detail["statut"]) == ("GET", "/api/stats/medecins", 200)
+    assert detail["requetes_sql"] >= 1
+    assert any(span["type"] == "sql" and "FROM users" in span["nom"] for span in detail["spans"])
+
+    folded = client.get(f"/api/admin/profiles/{profile_id}", headers=headers)
+    assert folded.status_code == 200
+    assert folded.headers["content-type"].startswith("text/plain")
+
+
+def test_profile_header_ignored_for_non_admins(client, auth_headers):
+    response = client.get("/api/auth/me", headers={**auth_headers["medecin"], "X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert "X-Profile-Id" not in client.get("/health", headers={"X-Profile": "1"}).headers
+
+
+def test_profile_download_rejects_unknown_ids(client, auth_headers):
+    headers = auth_headers["admin"]
+    assert client.get("/api/admin/profiles/20240101T000000-deadbeef", headers=headers).status_code == 404
+    assert client.get("/api/admin/profiles/..%2F..%2Fetc%2Fpasswd", headers=headers).status_code == 404
+    assert client.get("/api/admin/profiles", headers=auth_headers["medecin"]).status_code == 403
+
+
+def test_rotation_keeps_most_recent_profiles(tmp_path):
+    ids = []
+    for i in range(4):
+        profile = RequestProfile("GET", f"/{i}")
+        # Horodatages distincts : l'ordre lexical des identifiants est chronologique
+        profile.id = f"2024010{i + 1}T000000-{i:08x}"
+        profile.duration, profile.status_code = 0.01, 200
+        profile.write(str(tmp_path), max_files=10)
+        ids.append(profile.id)
+
+    rotate_profiles(str(tmp_path), max_files=2)
+    assert list_profile_ids(str(tmp_path)) == [ids[3], ids[2]]
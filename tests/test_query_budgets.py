@@ -0,0 +1,141 @@
+"""
+Budgets de requêtes SQL par endpoint
+Chaque endpoint des routeurs de app/routers est appelé sur le jeu de données
+généré (2 médecins x 30 patients x 3 diagnostics) ; le test échoue si le
+nombre de requêtes SQL ou de lignes lues sur les curseurs (entités ORM,
+colonnes, agrégats) dépasse le budget déclaré, en listant les requêtes
+exécutées. Un budget qui grandit doit être justifié dans la revue (N+1 sur Patient.diagnostics / Diagnostic.patient, etc.).
+Hors budget : le flux /api/stats/stream, le chargement d'un modèle et la
+lecture d'un profil (pas d'accès SQL propre à l'endpoint).
+
+    pytest -m query_budget
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import pytest
+
+pytestmark = pytest.mark.query_budget
+
+IMAGE = b"\x89PNG\r\n\x1a\n" + b"\x00" * 512
+CSV_IMPORT = (
+    "nom,prenom,date_naissance,sexe\n"
+    "Import,Un,1980-01-01T00:00:00,M\n"
+    "Import,Deux,1981-02-02T00:00:00,F\n"
+    "Import,Invalide,pas-une-date,F\n"
+).encode()
+
+
+@dataclass
+class Budget:
+    method: str
+    path: str
+    queries: int
+    rows: Optional[int] = None
+    user: Optional[str] = "medecin"
+    status: int = 200
+    # Arguments du client de test (fonction des enregistrements créés pour le test)
+    kwargs: Callable[[dict], dict] = field(default=lambda records: {})
+
+
+BUDGETS = [
+    # Authentification
+    Budget("POST", "/api/auth/login", 1, 1, user=None,
+           kwargs=lambda r: {"data": {"username": "medecin1@fibrose.test", "password": "password123"}}),
+    Budget("POST", "/api/auth/register", 4, 3, user="admin",
+           kwargs=lambda r: {"json": {"nom": "Dr. Budget", "email": "budget@hopital.fr", "password": "password123"}}),
+    Budget("GET", "/api/auth/me", 1, 1),
+
+    # Patients
+    Budget("POST", "/api/patients/", 3, 3,
+           kwargs=lambda r: {"json": {"nom": "Nouveau", "prenom": "Patient", "date_naissance": "1985-03-04T00:00:00", "sexe": "M"}}),
+    Budget("POST", "/api/patients/import", 2, 1,
+           kwargs=lambda r: {"files": {"file": ("patients.csv", CSV_IMPORT, "text/csv")}}),
+    Budget("POST", "/api/patients/bulk-delete", 5, 3,
+           kwargs=lambda r: {"json": {"ids": [r["patient_id"]]}}),
+    Budget("GET", "/api/patients/?limit=20", 2, 21),
+    Budget("GET", "/api/patients/?search=Martin&limit=20", 2, 2),
+    Budget("GET", "/api/patients/dossiers?ids=1,2,3,4,5,6,7,8,9,10", 3, 38),
+    Budget("GET", "/api/patients/{patient_id}/dossier", 3, 3),
+    Budget("GET", "/api/patients/{patient_id}", 2, 2),
+    Budget("PUT", "/api/patients/{patient_id}", 4, 3,
+           kwargs=lambda r: {"json": {"telephone": "0102030405"}}),
+    Budget("DELETE", "/api/patients/{patient_id}", 5, 3),
+
+    # Diagnostics
+    Budget("POST", "/api/diagnostics/", 4, 4,
+           kwargs=lambda r: {"params": {"patient_id": r["patient_id"]}, "files": {"image": ("coupe.png", IMAGE, "image/png")}}),
+    Budget("POST", "/api/diagnostics/bulk-delete", 4, 3,
+           kwargs=lambda r: {"json": {"ids": [r["diagnostic_id"]]}}),
+    Budget("GET", "/api/diagnostics/?limit=20", 2, 21),
+    Budget("GET", "/api/diagnostics/?patient_id={patient_id}", 2, 2),
+    Budget("GET", "/api/diagnostics/{diagnostic_id}", 2, 2),
+    Budget("DELETE", "/api/diagnostics/{diagnostic_id}", 3, 2),
+
+    # Statistiques
+    Budget("GET", "/api/stats/", 5, 9),
+    Budget("GET", "/api/stats/performance", 2, 4),
+    Budget("GET", "/api/stats/performance/distribution", 2, 1),
+    Budget("GET", "/api/stats/performance/stades", 2, 1),
+    Budget("GET", "/api/stats/performance/calibration", 2, 1),
+    Budget("GET", "/api/stats/medecins", 2, 4, user="admin"),
+
+    # Administration
+    # Liste des archives : les mois archivés de la période sont inclus dans la page
+    Budget("GET", "/api/admin/audit?limit=20", 3, 28, user="admin"),
+    Budget("GET", "/api/admin/audit/archives", 2, 7, user="admin"),
+    Budget("GET", "/api/admin/inference", 1, 1, user="admin"),
+    Budget("GET", "/api/admin/models", 1, 1, user="admin"),
+    Budget("GET", "/api/admin/profiles", 1, 1, user="admin"),
+
+    # Requêtes groupées : l'utilisateur est chargé une seule fois pour tout le lot
+    Budget("POST", "/api/batch", 6, 29,
+           kwargs=lambda r: {"json": {"requetes": [
+               {"chemin": "/api/auth/me"},
+               {"chemin": "/api/stats/"},
+               {"chemin": "/api/patients/", "params": {"limit": 20}},
+           ]}}),
+]
+
+
+@pytest.mark.parametrize("budget", [pytest.param(b, id=f"{b.method} {b.path}") for b in BUDGETS])
+def test_query_budget(budget: Budget, client, auth_headers, records, query_budget):
+    path = budget.path.format(**records)
+    kwargs = budget.kwargs(records)
+    if budget.user is not None:
+        kwargs["headers"] = auth_headers[budget.user]
+
+    if budget.method == "GET":
+        # Préchauffage : les caches (instantané d'analyse) ne comptent pas dans le budget
+        client.request(budget.method, path, **kwargs)
+
+    with query_budget(budget.queries, budget.rows):
+        response = client.request(budget.method, path, **kwargs)
+
+    assert response.status_code == budget.status, response.text
+
+
+def test_query_budget_reports_statements(client, auth_headers, query_budget):
+    """Un dépassement liste les requêtes exécutées"""
+    with pytest.raises(pytest.fail.Exception) as excinfo:
+        with query_budget(0):
+            client.get("/api/auth/me", headers=auth_headers["medecin"])
+    message = str(excinfo.value)
+    assert "requêtes SQL : 1 > 0" in message
+    assert "FROM users" in message
+
+
+def test_query_budget_counts_column_rows(seeded_database, query_budget):
+    """Les requêtes de colonnes comptent leurs lignes, pas seulement les entités ORM"""
+    from app.database import SessionLocal
+    from app.models import Patient
+
+    db = SessionLocal()
+    try:
+        with query_budget(1, 5) as counter:
+            ids = db.query(Patient.id).order_by(Patient.id).limit(5).all()
+    finally:
+        db.close()
+    assert len(ids) == 5
+    assert counter.rows == 5
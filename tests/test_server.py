@@ -0,0 +1,74 @@
+"""
+Lanceur de production (app/server.py)
+"""
+
+import os
+import subprocess
+import sys
+
+import app.server as server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_post_fork_recreates_process_state(monkeypatch):
+    import app.database as database
+    from app.inference import model_registry
+
+    calls = []
+    monkeypatch.setattr(database.engine, "dispose", lambda close=True: calls.append(("dispose", close)))
+    monkeypatch.setattr(model_registry, "load_all", lambda: calls.append(("load_all",)))
+
+    server.post_fork(None, None)
+
+    # Connexions du maître abandonnées sans être fermées, modèles chargés dans le worker
+    assert calls == [("dispose", False), ("load_all",)]
+
+
+def test_preload_prepares_models_without_loading_them(monkeypatch):
+    from app.inference import model_registry
+    from app.main import app
+
+    calls = []
+    monkeypatch.setattr(model_registry, "prepare", lambda: calls.append("prepare"))
+    monkeypatch.setattr(model_registry, "load_all", lambda: calls.append("load_all"))
+
+    assert server.preload() is app
+    assert calls == ["prepare"]
+
+
+def test_uvicorn_fallback_without_gunicorn(monkeypatch, tmp_path):
+    import uvicorn
+
+    captured = {}
+    monkeypatch.setattr(uvicorn, "run", lambda target, **kwargs: captured.update(kwargs, target=target))
+    # gunicorn absent
+    monkeypatch.setitem(sys.modules, "gunicorn.app.base", None)
+    monkeypatch.setattr(server, "WORKERS", 2)
+    monkeypatch.setenv("APP_WORKERS", "1")
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+
+    server.run_production("127.0.0.1", 8000)
+
+    assert captured["target"] == "app.main:app"
+    assert captured["workers"] == 2
+    # uvloop indisponible sous Windows, workers non relancés par uvicorn
+    assert captured["loop"] == "auto"
+    assert "limit_max_requests" not in captured
+    assert os.environ["APP_WORKERS"] == "2"
+
+
+def _max_concurrency(workers: str) -> int:
+    env = {**os.environ, "APP_WORKERS": workers}
+    env.pop("INFERENCE_MAX_CONCURRENCY", None)
+    result = subprocess.run(
+        [sys.executable, "-c", "from app.admission import inference_limiter; print(inference_limiter.max_concurrency)"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return int(result.stdout)
+
+
+def test_inference_places_are_shared_between_workers():
+    cpus = os.cpu_count() or 2
+    assert _max_concurrency("1") == cpus
+    assert _max_concurrency(str(cpus * 2)) == 1
@@ -0,0 +1,107 @@
+"""
+Mode SQLite : réglages des connexions et verrou d'écriture unique (app/sqlite_backend.py)
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
+
+from app.database import engine
+from app.sqlite_backend import WriterLock, apply_pragmas, connect_args, writer_lock
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    """Moteur configuré comme app/database.py sur une base de travail"""
+    scratch = create_engine(
+        f"sqlite:///{tmp_path / 'ecritures.db'}",
+        poolclass=QueuePool,
+        pool_size=4,
+        max_overflow=8,
+        connect_args=connect_args()
+    )
+    event.listen(scratch, "connect", apply_pragmas)
+    with scratch.begin() as conn:
+        conn.execute(text("CREATE TABLE mesures (id INTEGER PRIMARY KEY, worker INTEGER, valeur INTEGER)"))
+    yield scratch
+    scratch.dispose()
+
+
+def test_application_engine_pragmas():
+    with engine.connect() as conn:
+        pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("busy_timeout") == 30000
+        assert pragma("foreign_keys") == 1
+        assert pragma("synchronous") == 1  # NORMAL
+
+
+def test_concurrent_write_transactions_wait_their_turn(scratch_engine):
+    errors = []
+
+    def write(worker: int):
+        try:
+            for valeur in range(10):
+                with scratch_engine.begin() as conn:
+                    conn.execute(text("INSERT INTO mesures (worker, valeur) VALUES (:w, :v)"), {"w": worker, "v": valeur})
+                    # Transaction d'écriture longue : les autres threads attendent le verrou
+                    time.sleep(0.001)
+                    conn.execute(text("UPDATE mesures SET valeur = valeur + 1 WHERE worker = :w"), {"w": worker})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with scratch_engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM mesures")).scalar() == 80
+
+
+def test_writer_lock_released_on_rollback(scratch_engine):
+    with scratch_engine.connect() as conn:
+        conn.execute(text("INSERT INTO mesures (worker, valeur) VALUES (1, 1)"))
+        assert conn.connection.dbapi_connection.holds_writer
+        conn.rollback()
+        assert not conn.connection.dbapi_connection.holds_writer
+
+    # Verrou libre : un autre thread l'obtient immédiatement
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(writer_lock._lock.acquire(timeout=0.5)))
+    thread.start()
+    thread.join()
+    assert acquired == [True]
+    writer_lock.release()
+
+
+def test_reads_do_not_take_the_writer_lock(scratch_engine):
+    with scratch_engine.connect() as conn:
+        conn.execute(text("SELECT COUNT(*) FROM mesures")).scalar()
+        assert not conn.connection.dbapi_connection.holds_writer
+
+
+def test_writer_lock_timeout():
+    lock = WriterLock(timeout=0.05)
+    lock.acquire()
+    try:
+        failure = []
+
+        def contend():
+            try:
+                lock.acquire()
+            except sqlite3.OperationalError as e:
+                failure.append(e)
+
+        thread = threading.Thread(target=contend)
+        thread.start()
+        thread.join()
+        assert failure and "database is locked" in str(failure[0])
+    finally:
+        lock.release()
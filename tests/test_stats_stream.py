@@ -0,0 +1,72 @@
+"""
+Flux SSE du tableau de bord : droits, périmètre et instantané (app/routers/stats.py)
+"""
+
+import json
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import app.routers.stats as stats
+from app.events import stats_broker
+
+
+def _request(headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/stats/stream",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def _snapshot(payload: bytes) -> dict:
+    data = next(line for line in payload.decode().splitlines() if line.startswith("data:"))
+    return json.loads(data[len("data:"):])
+
+
+def test_stream_is_refused_before_it_opens(client, auth_headers):
+    # Même règle que GET /api/stats/ : un administrateur n'a pas accès aux statistiques
+    assert client.get("/api/stats/stream", headers=auth_headers["admin"]).status_code == 403
+    assert client.get("/api/stats/", headers=auth_headers["admin"]).status_code == 403
+    assert client.get("/api/stats/stream").status_code == 401
+    assert client.get("/api/stats/stream", params={"token": "invalide"}).status_code == 401
+
+
+def test_stream_scope_by_role(seeded_database, auth_headers):
+    medecin_id = stats._stream_user(_request(auth_headers["medecin"]), None)[1]
+    assert medecin_id is not None
+    assert stats._stream_user(_request(auth_headers["medecin2"]), None)[1] not in (None, medecin_id)
+    # Super-administrateur : tous les médecins
+    assert stats._stream_user(_request(auth_headers["super-admin"]), None)[1] is None
+
+    # Jeton en paramètre (EventSource) accepté comme l'en-tête
+    token = auth_headers["medecin"]["Authorization"].split(" ", 1)[1]
+    assert stats._stream_user(_request({}), token) == (token, medecin_id)
+
+    with pytest.raises(HTTPException) as refused:
+        stats._stream_user(_request(auth_headers["admin"]), None)
+    assert refused.value.status_code == 403
+
+
+def test_snapshot_is_scoped(seeded_database, auth_headers):
+    medecin_id = stats._stream_user(_request(auth_headers["medecin"]), None)[1]
+    own = _snapshot(stats._snapshot_event(medecin_id))
+    everyone = _snapshot(stats._snapshot_event(None))
+    assert 0 < own["total_diagnostics"] < everyone["total_diagnostics"]
+
+
+def test_snapshot_sequence_is_read_after_computing(seeded_database, monkeypatch):
+    compute = stats.compute_statistics
+
+    def compute_while_publishing(db, medecin_id=None):
+        result = compute(db, medecin_id)
+        # Événement publié pendant le calcul : déjà reflété par l'instantané
+        stats_broker.sequence += 1
+        return result
+
+    monkeypatch.setattr(stats, "compute_statistics", compute_while_publishing)
+    before = stats_broker.sequence
+    snapshot = _snapshot(stats._snapshot_event(None))
+    assert snapshot["sequence"] == before + 1